@@ -0,0 +1,155 @@
+# Index bootstrap for the GradeFresh collections.
+#
+# ensure_indexes() runs at API startup and is safe to repeat: creating an
+# index that already exists with the same spec is a no-op. It can also be run
+# on its own as a migration:
+#
+#   python -m app.database.indexes            # create indexes in DATABASE_NAME
+#   python -m app.database.indexes --check    # explain every route query against
+#                                             # a scratch database, fail on COLLSCAN
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        # register checks both for duplicates, login looks up by email
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        # admin stats groups by role; the admin user list filters by role and pages on _id
+        IndexModel([("role", ASCENDING), ("_id", ASCENDING)], name="role_id"),
+    ],
+    "news": [
+        # public news: published items, newest first, _id breaking ties for keyset pages
+        IndexModel(
+            [("is_published", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="published_recent_id"
+        ),
+        # admin news list: everything, newest first
+        IndexModel([("created_at", DESCENDING)], name="recent"),
+    ],
+    "predictions": [
+        # per-user history, newest first, paged on _id
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_recent"),
+    ],
+    "jobs": [
+        # job runners claim the oldest queued job or one whose lease ran out
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING), ("created_at", ASCENDING)], name="status_lease"),
+    ],
+    "job_results": [
+        # results pages and CSV export in archive order; unique so a resumed batch can't be stored twice
+        IndexModel([("job_id", ASCENDING), ("index", ASCENDING)], name="job_index_unique", unique=True),
+    ],
+}
+
+# (description, collection, filter, sort) for each query a route issues
+ROUTE_QUERIES = [
+    ("login / register: user by email", "users", {"email": "someone@example.com"}, None),
+    ("register: user by username", "users", {"username": "someone"}, None),
+    ("admin stats: users grouped by role", "users", {}, [("role", ASCENDING)]),
+    ("admin users: non-admin users, first page", "users", {"role": {"$ne": "admin"}}, [("_id", ASCENDING)]),
+    ("admin users: exporters after a cursor", "users",
+     {"role": "exporter", "_id": {"$gt": ObjectId("000000000000000000000000")}}, [("_id", ASCENDING)]),
+    ("public news: published, newest first", "news", {"is_published": True},
+     [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("admin news: newest first", "news", {}, [("created_at", DESCENDING)]),
+    ("prediction history: one user's page after a cursor", "predictions",
+     {"user_id": "someone", "_id": {"$lt": ObjectId("ffffffffffffffffffffffff")}}, [("_id", DESCENDING)]),
+    ("job runner: claimable jobs, oldest first", "jobs",
+     {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lte": datetime(2024, 1, 1)}}, [("created_at", ASCENDING)]),
+    ("job results: one job's page after an index", "job_results",
+     {"job_id": "some-job", "index": {"$gt": 100}}, [("index", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db):
+    """Create every index in INDEXES; failures are logged so the API still starts"""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created = await db[collection_name].create_indexes(indexes)
+            logger.info(f"Indexes on {collection_name}: {', '.join(created)}")
+        except OperationFailure as e:
+            # e.g. duplicate emails already stored prevent a unique index
+            logger.error(f"Could not create indexes on {collection_name}: {e}")
+        except Exception as e:
+            logger.error(f"Index bootstrap for {collection_name} failed: {e}")
+
+
+def _plan_stages(plan) -> list:
+    """Every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_plans(db) -> bool:
+    """Explain each route query and report whether any still scans a whole collection"""
+    ok = True
+    for description, collection_name, query, sort in ROUTE_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            ok = False
+            print(f"❌ {description}: {' <- '.join(stages)}")
+        else:
+            print(f"✅ {description}: {' <- '.join(stages)}")
+    return ok
+
+
+async def _check(url: str) -> bool:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=5000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        print(f"❌ Cannot reach MongoDB at {url}: {e}")
+        return False
+    # A scratch database keeps the check independent of whatever data is loaded
+    db = client["gradefresh_index_check"]
+    try:
+        await ensure_indexes(db)
+        return await check_query_plans(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create GradeFresh MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="explain route queries and fail on COLLSCAN")
+    parser.add_argument("--url", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.check:
+        sys.exit(0 if asyncio.run(_check(args.url)) else 1)
+
+    from app.database.mongodb import get_database
+    asyncio.run(ensure_indexes(get_database()))
+
+
+if __name__ == "__main__":
+    # Allow `python app/database/indexes.py` as well as `python -m app.database.indexes`
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    main()
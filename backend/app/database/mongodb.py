@@ -1,15 +1,179 @@
+import asyncio
+import logging
 import os
+import threading
+import time
+from typing import Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from dotenv import load_dotenv
 
+from app.utils.metrics import mongo_command_duration
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # CORRECT: Get the values from environment variables
 MONGODB_URL = os.getenv("MONGODB_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
 
-client = AsyncIOMotorClient(MONGODB_URL)
-database = client[DATABASE_NAME]
+# Connection pool and timeouts. minPoolSize keeps warm connections open so the
+# first queries after a deploy don't each pay for a TCP + TLS + auth handshake.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+# Upper bound for the ping behind /health
+MONGO_PING_TIMEOUT_SECONDS = float(os.getenv("MONGO_PING_TIMEOUT_SECONDS", 2))
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters, fed by pymongo's pool events (called from driver threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._add(in_use=-1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "utilization": self.in_use / MONGO_MAX_POOL_SIZE if MONGO_MAX_POOL_SIZE else 0.0,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per-command latency for /metrics, labelled by command and collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = (
+                collection if isinstance(collection, str) else ""
+            )
+
+    def _finished(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(
+            event.duration_micros / 1e6, command=event.command_name, collection=collection, outcome=outcome
+        )
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+command_metrics = CommandMetrics()
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def connect() -> AsyncIOMotorClient:
+    """Create the shared client if it doesn't exist yet; safe to call repeatedly"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGODB_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[pool_metrics, command_metrics],
+        )
+    return _client
+
+
+def close():
+    """Close every pooled connection; the next get_database() reconnects"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("MongoDB client closed")
+
 
 def get_database():
-    return database
\ No newline at end of file
+    # Connects on first use, so scripts like create_admin.py work without the API lifespan
+    return connect()[DATABASE_NAME]
+
+
+async def ping(timeout: float = MONGO_PING_TIMEOUT_SECONDS) -> dict:
+    """Round trip to the server for health checks; never raises"""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(connect().admin.command("ping"), timeout)
+        return {"status": "ok", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except Exception as e:
+        return {"status": "unavailable", "error": str(e) or type(e).__name__}
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+
+from app.database.stats import admin_stats
+
+logger = logging.getLogger(__name__)
+
+# Predictions buffered before new ones are dropped, and how writes are grouped
+PREDICTION_BUFFER_SIZE = int(os.getenv("PREDICTION_BUFFER_SIZE", 10000))
+PREDICTION_FLUSH_SIZE = int(os.getenv("PREDICTION_FLUSH_SIZE", 200))
+PREDICTION_FLUSH_MS = float(os.getenv("PREDICTION_FLUSH_MS", 1000))
+
+PREDICTIONS_COLLECTION = "predictions"
+
+
+def prediction_record(
+    prediction: dict,
+    prediction_id: str,
+    filename: Optional[str],
+    image_hash: Optional[str],
+    user_id: Optional[str],
+    source: str,
+) -> dict:
+    """The `predictions` document for one graded image"""
+    return {
+        "_id": ObjectId(),
+        "prediction_id": prediction_id,
+        "user_id": user_id,
+        "source": source,
+        "filename": filename,
+        "image_hash": image_hash,
+        "model_version": prediction.get("model_version"),
+        "inference_mode": prediction.get("inference_mode", "standard"),
+        "class": prediction["class"],
+        "confidence": prediction["confidence"],
+        "quality_code": prediction["quality_code"],
+        "export_suitable": prediction["export_suitable"],
+        "probabilities": prediction["all_predictions"],
+        "created_at": datetime.utcnow(),
+    }
+
+
+class PredictionWriter:
+    """
+    Buffered writer for the `predictions` collection. Request handlers call
+    record(), which never waits on MongoDB; a background task groups records
+    into insert_many calls of up to PREDICTION_FLUSH_SIZE, or whatever arrived
+    within PREDICTION_FLUSH_MS. If MongoDB falls behind far enough to fill the
+    buffer, new records are dropped and counted rather than slowing requests.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = PREDICTION_BUFFER_SIZE,
+        flush_size: int = PREDICTION_FLUSH_SIZE,
+        flush_ms: float = PREDICTION_FLUSH_MS,
+    ):
+        self.buffer_size = buffer_size
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_ms / 1000.0
+        self._db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Records taken off the queue but not yet handed to insert_many, and the insert in progress
+        self._batch: List[dict] = []
+        self._flushing: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self, db):
+        """Start the flush loop on the running event loop"""
+        self._db = db
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.buffer_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+        remaining, self._batch = self._batch, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.flush_size):
+            await self._flush(remaining[start:start + self.flush_size])
+
+    def record(self, document: dict):
+        """Queue one prediction document without waiting"""
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Prediction buffer full, {self.dropped} predictions dropped so far")
+
+    async def _collect(self) -> List[dict]:
+        """Wait for the first record, then keep collecting until the batch is full or the interval ends"""
+        loop = asyncio.get_running_loop()
+        batch = self._batch
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.flush_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self._batch = []
+            # Shielded so stop() waits for an insert already under way instead of cutting it off
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, batch: List[dict]):
+        try:
+            await self._db[PREDICTIONS_COLLECTION].insert_many(batch, ordered=False)
+            self.written += len(batch)
+            await admin_stats.predictions_added(self._db, batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} predictions: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._batch) + (self._queue.qsize() if self._queue is not None else 0),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+prediction_writer = PredictionWriter()
@@ -0,0 +1,140 @@
+import logging
+import os
+import time
+from collections import Counter
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long a computed dashboard is served before counting again
+ADMIN_STATS_TTL_SECONDS = float(os.getenv("ADMIN_STATS_TTL_SECONDS", 10))
+# Keep running `stats` documents updated on register / delete / prediction writes instead of aggregating
+ADMIN_STATS_COUNTERS = os.getenv("ADMIN_STATS_COUNTERS", "false").lower() in ("1", "true", "yes")
+
+ROLES = ("exporter", "importer", "inspector", "admin")
+STATS_COLLECTION = "stats"
+USER_COUNTS_ID = "users"
+PREDICTION_COUNTS_ID = "predictions"
+
+
+def _format(users: dict, predictions: dict) -> dict:
+    """The response shape get_admin_stats has always returned, plus prediction volume"""
+    roles = users.get("roles", {})
+    return {
+        "total_users": users.get("total", 0),
+        "exporters": roles.get("exporter", 0),
+        "importers": roles.get("importer", 0),
+        "inspectors": roles.get("inspector", 0),
+        "admins": roles.get("admin", 0),
+        "predictions": {
+            "total": predictions.get("total", 0),
+            "by_class": predictions.get("by_class", {}),
+            "by_quality": predictions.get("by_quality", {}),
+        },
+    }
+
+
+def _safe_key(value) -> Optional[str]:
+    """Labels used as field names in counter documents can't contain '.' or start with '$'"""
+    key = str(value)
+    return None if "." in key or key.startswith("$") else key
+
+
+async def count_users_by_role(db) -> dict:
+    """One $group pass over users instead of a count per role"""
+    roles = {}
+    total = 0
+    # Sorting on role first lets the pipeline walk the role index instead of the documents
+    pipeline = [{"$sort": {"role": 1}}, {"$group": {"_id": "$role", "count": {"$sum": 1}}}]
+    async for row in db["users"].aggregate(pipeline):
+        total += row["count"]
+        if row["_id"] in ROLES:
+            roles[row["_id"]] = row["count"]
+    return {"total": total, "roles": roles}
+
+
+async def count_predictions(db) -> dict:
+    """Prediction volume by class and by quality code in one $group pass"""
+    by_class, by_quality = Counter(), Counter()
+    pipeline = [{"$group": {"_id": {"class": "$class", "quality": "$quality_code"}, "count": {"$sum": 1}}}]
+    async for row in db["predictions"].aggregate(pipeline):
+        by_class[row["_id"].get("class")] += row["count"]
+        by_quality[row["_id"].get("quality")] += row["count"]
+    return {
+        "total": sum(by_class.values()),
+        "by_class": {k: v for k, v in by_class.items() if _safe_key(k)},
+        "by_quality": {k: v for k, v in by_quality.items() if _safe_key(k)},
+    }
+
+
+async def _counter_document(db, document_id: str, rebuild) -> dict:
+    """Maintained counters, rebuilt from an aggregation when missing"""
+    stats_collection = db[STATS_COLLECTION]
+    counts = await stats_collection.find_one({"_id": document_id})
+    if counts is None:
+        counts = await rebuild(db)
+        await stats_collection.update_one({"_id": document_id}, {"$set": counts}, upsert=True)
+    return counts
+
+
+class AdminStats:
+    """User and prediction counts for the admin dashboard, cached in-process for a few seconds"""
+
+    def __init__(self, ttl_seconds: float = ADMIN_STATS_TTL_SECONDS, counters: bool = ADMIN_STATS_COUNTERS):
+        self.ttl_seconds = ttl_seconds
+        self.counters = counters
+        self._cached: Optional[dict] = None
+        self._expires = 0.0
+
+    async def get(self, db) -> dict:
+        if self._cached is not None and time.monotonic() < self._expires:
+            return dict(self._cached)
+        if self.counters:
+            users = await _counter_document(db, USER_COUNTS_ID, count_users_by_role)
+            predictions = await _counter_document(db, PREDICTION_COUNTS_ID, count_predictions)
+        else:
+            users = await count_users_by_role(db)
+            predictions = await count_predictions(db)
+        self._cached = _format(users, predictions)
+        self._expires = time.monotonic() + self.ttl_seconds
+        return dict(self._cached)
+
+    def invalidate(self):
+        self._cached = None
+
+    async def user_added(self, db, role: str):
+        await self._adjust(db, role, 1)
+
+    async def user_removed(self, db, role: str):
+        await self._adjust(db, role, -1)
+
+    async def predictions_added(self, db, documents: List[dict]):
+        """Count a batch of newly written predictions; the TTL alone keeps the cached view fresh enough"""
+        if not self.counters:
+            return
+        increments = Counter({"total": len(documents)})
+        for document in documents:
+            for field, value in (("by_class", document.get("class")), ("by_quality", document.get("quality_code"))):
+                key = _safe_key(value)
+                if key:
+                    increments[f"{field}.{key}"] += 1
+        await self._increment(db, PREDICTION_COUNTS_ID, dict(increments))
+
+    async def _adjust(self, db, role: str, delta: int):
+        self.invalidate()
+        if not self.counters:
+            return
+        increments = {"total": delta}
+        if role in ROLES:
+            increments[f"roles.{role}"] = delta
+        await self._increment(db, USER_COUNTS_ID, increments)
+
+    async def _increment(self, db, document_id: str, increments: dict):
+        try:
+            # No upsert: a missing document is rebuilt from scratch on the next read
+            await db[STATS_COLLECTION].update_one({"_id": document_id}, {"$inc": increments})
+        except Exception as e:
+            logger.error(f"Error updating {document_id} counters: {e}")
+
+
+admin_stats = AdminStats()
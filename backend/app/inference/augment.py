@@ -0,0 +1,36 @@
+import os
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+# High-accuracy mode re-scores an image with augmented views only when the
+# first pass is less confident than this, so confident images cost nothing extra
+TTA_CONFIDENCE_THRESHOLD = float(os.getenv("TTA_CONFIDENCE_THRESHOLD", 0.6))
+# Side of each crop as a fraction of the image
+TTA_CROP_FRACTION = float(os.getenv("TTA_CROP_FRACTION", 0.875))
+
+
+def augment_pixels(pixels: np.ndarray) -> List[np.ndarray]:
+    """
+    Flipped and cropped views of one model-sized uint8 image: horizontal and
+    vertical flips plus centre, top-left and bottom-right crops resized back to
+    the model input. Runs in the decode process pool, like decode_image.
+    """
+    height, width = pixels.shape[:2]
+    views = [pixels[:, ::-1], pixels[::-1, :]]
+    crop_height, crop_width = int(height * TTA_CROP_FRACTION), int(width * TTA_CROP_FRACTION)
+    corners = [
+        ((height - crop_height) // 2, (width - crop_width) // 2),
+        (0, 0),
+        (height - crop_height, width - crop_width),
+    ]
+    for top, left in corners:
+        crop = Image.fromarray(pixels[top:top + crop_height, left:left + crop_width])
+        views.append(np.asarray(crop.resize((width, height), Image.BILINEAR)))
+    return [np.ascontiguousarray(view) for view in views]
+
+
+def average_views(original: np.ndarray, views: np.ndarray) -> np.ndarray:
+    """Mean class probabilities over the original image and its augmented views"""
+    return (original + views.sum(axis=0)) / (len(views) + 1)
@@ -0,0 +1,273 @@
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Which runtime serves the CNN: keras, tflite, onnx, or remote (the shared
+# inference server started by app.launcher for multi-worker deployments)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras").lower()
+# Serve the float model or the post-training int8 model produced by quantize_model.py
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float32").lower()
+# Intra-op threads for the TFLite / ONNX Runtime interpreters (0 = runtime default)
+BACKEND_NUM_THREADS = int(os.getenv("BACKEND_NUM_THREADS", 0))
+
+# Where the shared inference server listens, and the key workers authenticate with
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "")
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", 120))
+
+MODEL_BASENAME = "fruit_quality_cnn_model"
+
+
+class InferenceBackend:
+    """Common interface over the runtimes that can execute the fruit quality CNN"""
+
+    name = "base"
+    precision = "float32"
+
+    def __init__(self, model_path: Path):
+        self.model_path = Path(model_path)
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        """Run a N x H x W x 3 float32 batch and return N x classes probabilities"""
+        raise NotImplementedError
+
+    def describe(self) -> dict:
+        """Shape information reported by /api/model-info"""
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    """The original .h5 model executed by Keras"""
+
+    name = "keras"
+
+    def __init__(self, model_path: Path):
+        super().__init__(model_path)
+        from tensorflow.keras.models import load_model
+
+        self.model = load_model(self.model_path)
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        # Calling the model directly skips predict()'s per-call tf.data setup
+        return self.model(img_batch, training=False).numpy()
+
+    def describe(self) -> dict:
+        return {
+            "input_shape": self.model.input_shape,
+            "output_shape": self.model.output_shape,
+            "layers": len(self.model.layers),
+        }
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TensorFlow Lite interpreter. Uses the standalone tflite_runtime package when
+    installed, otherwise the interpreter bundled with TensorFlow. The default op
+    resolver applies the XNNPACK delegate to float CPU kernels.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: Path, precision: str = "float32"):
+        super().__init__(model_path)
+        self.precision = precision
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            # tensorflow.lite is not an importable module path, only an attribute of tf
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(
+            model_path=str(self.model_path),
+            num_threads=BACKEND_NUM_THREADS or None,
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # Fully-integer models take quantized input; float-I/O int8 models take float32 as usual
+        self._input_scale, self._input_zero_point = self._input["quantization"]
+        self._output_scale, self._output_zero_point = self._output["quantization"]
+        # The interpreter holds mutable tensor state, so one call at a time
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size: int):
+        if batch_size != self._batch_size:
+            shape = list(self._input["shape"])
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self._input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self._resize(len(img_batch))
+            if self._input["dtype"] != np.float32:
+                img_batch = np.round(img_batch / self._input_scale + self._input_zero_point)
+                img_batch = img_batch.astype(self._input["dtype"])
+            self.interpreter.set_tensor(self._input["index"], img_batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+            if self._output["dtype"] != np.float32:
+                return (output.astype(np.float32) - self._output_zero_point) * self._output_scale
+            return output.copy()
+
+    def describe(self) -> dict:
+        return {
+            "input_shape": [None] + [int(d) for d in self._input["shape"][1:]],
+            "output_shape": [None] + [int(d) for d in self._output["shape"][1:]],
+            "layers": len(self.interpreter.get_tensor_details()),
+        }
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime on the CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: Path):
+        super().__init__(model_path)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if BACKEND_NUM_THREADS:
+            options.intra_op_num_threads = BACKEND_NUM_THREADS
+        self.session = ort.InferenceSession(
+            str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input = self.session.get_inputs()[0]
+        self._output = self.session.get_outputs()[0]
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        return self.session.run([self._output.name], {self._input.name: img_batch})[0]
+
+    def describe(self) -> dict:
+        def shape(dims):
+            return [d if isinstance(d, int) else None for d in dims]
+
+        return {
+            "input_shape": shape(self._input.shape),
+            "output_shape": shape(self._output.shape),
+            "layers": None,
+        }
+
+
+class RemoteBackend(InferenceBackend):
+    """
+    Client for the shared inference server (app.inference.server). Each
+    inference thread keeps its own connection; the weights for `models_dir`
+    live only in the server process.
+    """
+
+    name = "remote"
+
+    def __init__(self, models_dir: Path, socket_path: str = INFERENCE_SOCKET, authkey: str = INFERENCE_AUTHKEY):
+        if not socket_path:
+            raise RuntimeError("INFERENCE_BACKEND=remote requires INFERENCE_SOCKET")
+        self.models_dir = str(models_dir)
+        self.socket_path = socket_path
+        self.authkey = bytes.fromhex(authkey) if authkey else None
+        self._local = threading.local()
+        # The server may still be loading the model, so wait for it to come up
+        self._info = self._call("describe", timeout=INFERENCE_CONNECT_TIMEOUT)
+        super().__init__(self._info["model_path"])
+        self.precision = self._info["precision"]
+        self.server_backend = self._info["name"]
+
+    def _connection(self, timeout: float = 0):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn = Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"Inference server not reachable at {self.socket_path}")
+                time.sleep(0.5)
+        self._local.conn = conn
+        return conn
+
+    def _send(self, request: tuple, timeout: float):
+        conn = self._connection(timeout)
+        try:
+            conn.send(request)
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            # Drop the broken connection so the next call reconnects
+            self._local.conn = None
+            raise RuntimeError("Lost connection to the inference server")
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+    def _call(self, command, *args, timeout: float = 0):
+        return self._send((command, self.models_dir) + args, timeout)
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        return self._call("predict", img_batch)
+
+    def describe(self) -> dict:
+        return {
+            "input_shape": self._info["input_shape"],
+            "output_shape": self._info["output_shape"],
+            "layers": self._info["layers"],
+            "server_backend": self.server_backend,
+        }
+
+
+BACKENDS = {
+    "keras": (KerasBackend, ".h5"),
+    "tflite": (TFLiteBackend, ".tflite"),
+    "onnx": (OnnxBackend, ".onnx"),
+}
+
+
+def model_file(models_dir: Path, backend_name: str, precision: str = "float32") -> Path:
+    """Path of the model artifact a backend expects inside models_dir"""
+    _, suffix = BACKENDS[backend_name]
+    if precision == "int8":
+        return Path(models_dir) / f"{MODEL_BASENAME}_int8{suffix}"
+    return Path(models_dir) / f"{MODEL_BASENAME}{suffix}"
+
+
+def load_backend(
+    models_dir: Path,
+    backend_name: str = INFERENCE_BACKEND,
+    precision: str = MODEL_PRECISION,
+) -> InferenceBackend:
+    """Instantiate the configured backend on its model file"""
+    if backend_name == "remote":
+        logger.info(f"Using shared inference server at: {INFERENCE_SOCKET}")
+        return RemoteBackend(models_dir)
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{backend_name}', expected one of {list(BACKENDS)}")
+    if precision not in ("float32", "int8"):
+        raise ValueError(f"Unknown MODEL_PRECISION '{precision}', expected float32 or int8")
+
+    if precision == "int8":
+        # Only the TFLite runtime executes the quantized model
+        if backend_name != "tflite":
+            logger.info(f"MODEL_PRECISION=int8 overrides INFERENCE_BACKEND={backend_name}, using tflite")
+        path = model_file(models_dir, "tflite", precision)
+        logger.info(f"Loading int8 tflite model from: {path}")
+        return TFLiteBackend(path, precision="int8")
+
+    backend_cls, _ = BACKENDS[backend_name]
+    path = model_file(models_dir, backend_name)
+    logger.info(f"Loading {backend_name} model from: {path}")
+    return backend_cls(path)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.inference.executors import run_inference
+from app.utils.metrics import inference_stage_duration
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on images per forward pass and how long to wait for a batch to fill
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 32))
+BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", 5))
+
+
+class MicroBatcher:
+    """
+    Shared inference queue. Single-image requests from concurrent callers are
+    collected for a few milliseconds and run through one batched predict call,
+    then each caller gets its own row of the output back. `predict_fn` receives
+    the model and the list of queued images and runs on the inference thread
+    pool. Requests pinned to different models (during a hot swap) are never
+    mixed in one batch.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[Any, List[np.ndarray]], np.ndarray],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = BATCH_WAIT_MS,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail anything still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference queue stopped"))
+
+    async def submit(self, img_array: np.ndarray, model: Any = None) -> np.ndarray:
+        """Queue one decoded image for `model` and wait for its prediction row"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((model, img_array, future, loop.time()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, np.ndarray, asyncio.Future, float]]:
+        """Wait for the first request, then keep collecting until the batch is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without yielding
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnected) don't need a slot in the batch
+            groups = {}
+            for model, array, future, enqueued_at in batch:
+                if not future.done():
+                    groups.setdefault(id(model), (model, []))[1].append((array, future, enqueued_at))
+
+            for model, items in groups.values():
+                await self._predict(model, items)
+
+    async def _predict(self, model: Any, items: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        inputs = [array for array, _, _ in items]
+        now = asyncio.get_running_loop().time()
+        for _, _, enqueued_at in items:
+            inference_stage_duration.observe(now - enqueued_at, stage="queue_wait")
+        try:
+            predictions = await run_inference(self.predict_fn, model, inputs)
+        except Exception as e:
+            logger.error(f"Batched prediction failed for {len(items)} images: {e}")
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), row in zip(items, predictions):
+            if not future.done():
+                future.set_result(row)
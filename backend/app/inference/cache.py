@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.database.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in process memory, and whether to spill predictions to MongoDB
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 1024))
+PREDICTION_CACHE_MONGO = os.getenv("PREDICTION_CACHE_MONGO", "false").lower() == "true"
+
+
+def hash_image(contents: bytes) -> str:
+    """Content address of an uploaded image"""
+    return hashlib.sha256(contents).hexdigest()
+
+
+def fingerprint_file(path: Path) -> str:
+    """Hash of a model file, so cached predictions are tied to the exact weights that produced them"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Content-addressed prediction cache: a bounded in-memory LRU in front of an
+    optional MongoDB `predictions_cache` collection. Keys combine the model
+    fingerprint and the image hash, so loading different weights invalidates
+    every earlier entry automatically.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE, use_mongo: bool = PREDICTION_CACHE_MONGO):
+        self.max_entries = max_entries
+        self.use_mongo = use_mongo
+        self.model_fingerprint: Optional[str] = None
+        self._entries: OrderedDict = OrderedDict()
+        # Background MongoDB writes, referenced until they finish so they aren't garbage-collected
+        self._spills = set()
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    def set_model_fingerprint(self, fingerprint: str):
+        """Switch the cache to a newly loaded model, dropping in-memory entries from the old one"""
+        if fingerprint != self.model_fingerprint:
+            self._entries.clear()
+            self.model_fingerprint = fingerprint
+            logger.info(f"Prediction cache bound to model {fingerprint}")
+
+    async def get(self, image_hash: str, fingerprint: Optional[str] = None) -> Optional[dict]:
+        """Return the cached prediction for an image under the given (default: current) model, or None"""
+        fingerprint = fingerprint or self.model_fingerprint
+        if fingerprint is None or self.max_entries <= 0:
+            self.misses += 1
+            return None
+
+        key = f"{fingerprint}:{image_hash}"
+        prediction = self._entries.get(key)
+        if prediction is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(prediction)
+
+        if self.use_mongo:
+            try:
+                doc = await get_database()["predictions_cache"].find_one({"_id": key})
+            except Exception as e:
+                logger.warning(f"Prediction cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                self._remember(key, doc["prediction"])
+                self.mongo_hits += 1
+                return dict(doc["prediction"])
+
+        self.misses += 1
+        return None
+
+    async def put(self, image_hash: str, prediction: dict, fingerprint: Optional[str] = None):
+        """Store a prediction; the MongoDB write happens in the background"""
+        fingerprint = fingerprint or self.model_fingerprint
+        if fingerprint is None or self.max_entries <= 0:
+            return
+        key = f"{fingerprint}:{image_hash}"
+        self._remember(key, prediction)
+        if self.use_mongo:
+            task = asyncio.create_task(self._spill(key, image_hash, fingerprint, prediction))
+            self._spills.add(task)
+            task.add_done_callback(self._spill_done)
+
+    def _remember(self, key: str, prediction: dict):
+        self._entries[key] = prediction
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _spill(self, key: str, image_hash: str, fingerprint: str, prediction: dict):
+        await get_database()["predictions_cache"].replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "image_hash": image_hash,
+                "model_fingerprint": fingerprint,
+                "prediction": prediction,
+                "created_at": datetime.utcnow(),
+            },
+            upsert=True,
+        )
+
+    def _spill_done(self, task: asyncio.Task):
+        self._spills.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Prediction cache write failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.mongo_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "mongo_enabled": self.use_mongo,
+            "model_fingerprint": self.model_fingerprint,
+        }
+
+
+prediction_cache = PredictionCache()
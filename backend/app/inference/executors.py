@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH
+from app.inference.uploads import UPLOAD_SPOOL_MEMORY_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Threads that run TensorFlow forward passes
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 1))
+# Worker processes that run PIL decoding and preprocessing
+DECODE_PROCESSES = int(os.getenv("DECODE_PROCESSES", os.cpu_count() or 1))
+# Images allowed in flight (decoding, queued or predicting) before new requests get a 503
+MAX_PENDING_IMAGES = int(os.getenv("MAX_PENDING_IMAGES", 64))
+RETRY_AFTER_SECONDS = int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", 2))
+
+# Memory budget for one /api/predict-batch request. Uploads spill to disk past
+# UPLOAD_SPOOL_MEMORY_BYTES, so each file holds at most that much in memory
+# plus its decoded input tensor while the batch is built.
+BATCH_MEMORY_LIMIT_MB = int(os.getenv("BATCH_MEMORY_LIMIT_MB", 512))
+_TENSOR_BYTES = IMG_HEIGHT * IMG_WIDTH * 3 * 4
+
+
+def max_batch_files() -> int:
+    """Files accepted per batch request: MAX_BATCH_FILES if set, else derived from the memory budget"""
+    configured = int(os.getenv("MAX_BATCH_FILES", 0))
+    if configured > 0:
+        limit = configured
+    else:
+        per_file = UPLOAD_SPOOL_MEMORY_BYTES + _TENSOR_BYTES
+        limit = (BATCH_MEMORY_LIMIT_MB * 1024 * 1024) // per_file
+    # A batch larger than the backpressure limit could never be admitted
+    return max(1, min(limit, MAX_PENDING_IMAGES))
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_THREADS, thread_name_prefix="inference"
+)
+# Loading and warming a new model version runs here, not on the inference
+# threads, so a hot swap never queues live predictions behind it
+model_loader_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+# Spawn rather than fork so decode workers never inherit TensorFlow state
+decode_executor = ProcessPoolExecutor(
+    max_workers=DECODE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+)
+
+_pending_images = 0
+
+
+async def run_inference(fn, *args):
+    """Run a blocking inference call on the inference thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, fn, *args)
+
+
+async def run_model_load(fn, *args):
+    """Run a blocking model load or warm-up on the model loader thread"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(model_loader_executor, fn, *args)
+
+
+async def run_decode(fn, *args):
+    """Run a CPU-bound decode/preprocess call on the decode process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(decode_executor, fn, *args)
+
+
+def pending_images() -> int:
+    return _pending_images
+
+
+@asynccontextmanager
+async def inference_slot(count: int = 1):
+    """
+    Reserve room for `count` images in the inference pipeline.
+    Raises 503 with Retry-After when the pipeline is already saturated.
+    """
+    global _pending_images
+    if _pending_images + count > MAX_PENDING_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference queue is full, please retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    _pending_images += count
+    try:
+        yield
+    finally:
+        _pending_images -= count
+
+
+def shutdown_executors():
+    """Release worker threads and processes"""
+    inference_executor.shutdown(wait=True, cancel_futures=True)
+    model_loader_executor.shutdown(wait=True, cancel_futures=True)
+    decode_executor.shutdown(wait=True, cancel_futures=True)
+    logger.info("Inference executors shut down")
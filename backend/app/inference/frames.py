@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+# Frames per second a connection may ask for, and how many cameras may stream at once per worker
+WS_MAX_FPS = float(os.getenv("WS_MAX_FPS", 10))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 32))
+# Achieved FPS is measured over this trailing window
+FPS_WINDOW_SECONDS = 2.0
+
+
+class StreamStats:
+    """Frame streaming totals for /api/inference/stats"""
+
+    def __init__(self):
+        self.open = 0
+        self.opened = 0
+        self.frames_graded = 0
+        self.frames_dropped = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "open": self.open,
+            "opened": self.opened,
+            "frames_graded": self.frames_graded,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+stream_stats = StreamStats()
+
+
+class FrameStream:
+    """
+    Frames received on one connection, waiting to be graded. Only the newest
+    frame is kept: one that arrives while the previous is still waiting
+    replaces it, so a camera that outpaces inference gets results for current
+    frames instead of an ever-growing backlog. Frames arriving faster than
+    `max_fps` are dropped on receipt.
+    """
+
+    def __init__(self, max_fps: float = WS_MAX_FPS):
+        self.max_fps = max(0.1, min(max_fps, WS_MAX_FPS))
+        self._min_interval = 1.0 / self.max_fps
+        self._last_accepted = float("-inf")
+        self._latest: Optional[Tuple[int, bytes, float]] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._completed = deque()
+        self.received = 0
+        self.graded = 0
+        self.stale = 0
+        self.rate_limited = 0
+
+    def offer(self, frame: bytes):
+        """Queue a frame from the client, replacing any frame not yet picked up"""
+        now = time.monotonic()
+        self.received += 1
+        if now - self._last_accepted < self._min_interval:
+            self.rate_limited += 1
+            stream_stats.frames_dropped += 1
+            return
+        self._last_accepted = now
+        if self._latest is not None:
+            self.stale += 1
+            stream_stats.frames_dropped += 1
+        self._latest = (self.received, frame, now)
+        self._ready.set()
+
+    def drop(self):
+        """A picked-up frame was shed because the pipeline is saturated"""
+        self.stale += 1
+        stream_stats.frames_dropped += 1
+
+    async def next(self) -> Optional[Tuple[int, bytes, float]]:
+        """(sequence number, frame, receive time) of the newest frame, or None once the client is gone"""
+        while self._latest is None and not self._closed:
+            self._ready.clear()
+            await self._ready.wait()
+        latest, self._latest = self._latest, None
+        return latest
+
+    def close(self):
+        self._closed = True
+        self._latest = None
+        self._ready.set()
+
+    def completed(self):
+        now = time.monotonic()
+        self.graded += 1
+        stream_stats.frames_graded += 1
+        self._completed.append(now)
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._completed and self._completed[0] < now - FPS_WINDOW_SECONDS:
+            self._completed.popleft()
+
+    def fps(self) -> float:
+        """
+        Frames graded per second across the completions in the trailing window,
+        measured between the first and last of them; 0 until there are two.
+        Capped at max_fps, since a slow frame followed by a fast one can finish
+        closer together than frames are accepted.
+        """
+        self._trim(time.monotonic())
+        if len(self._completed) < 2:
+            return 0.0
+        span = self._completed[-1] - self._completed[0]
+        return min((len(self._completed) - 1) / span, self.max_fps) if span > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "max_fps": self.max_fps,
+            "fps": round(self.fps(), 2),
+            "received": self.received,
+            "graded": self.graded,
+            "dropped_stale": self.stale,
+            "dropped_rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,434 @@
+import asyncio
+import hashlib
+import io
+import logging
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import uuid
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterator, List, NamedTuple, Optional, Union
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.database.predictions import prediction_record, prediction_writer
+from app.inference.executors import (
+    BATCH_MEMORY_LIMIT_MB, MAX_PENDING_IMAGES, RETRY_AFTER_SECONDS, inference_slot, max_batch_files, pending_images
+)
+from app.inference.registry import model_registry
+from app.inference.uploads import MAX_UPLOAD_BYTES, check_image
+
+logger = logging.getLogger(__name__)
+
+# Where submitted archives are kept until their job finishes. Every worker that
+# may resume a job must see the same directory, so use shared storage when the
+# API runs on more than one machine.
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "gradefresh-jobs"))
+MAX_JOB_ARCHIVE_MB = int(os.getenv("MAX_JOB_ARCHIVE_MB", 2048))
+MAX_JOB_ARCHIVE_BYTES = MAX_JOB_ARCHIVE_MB * 1024 * 1024
+# Images graded per forward pass, and the compressed bytes one batch may hold in memory
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", 32))
+JOB_BATCH_MEMORY_BYTES = int(os.getenv("JOB_BATCH_MEMORY_MB", BATCH_MEMORY_LIMIT_MB // 4)) * 1024 * 1024
+# Jobs processed at once by each worker
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 1))
+# A running job whose worker hasn't checkpointed within the lease is taken over by another worker
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 120))
+# Claims in a row that end without a checkpoint before a job is failed instead of retried
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# How often idle workers look for queued or abandoned jobs
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 5))
+
+JOBS_COLLECTION = "jobs"
+JOB_RESULTS_COLLECTION = "job_results"
+ARCHIVE_CHUNK_BYTES = 1024 * 1024
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+# A damaged or unreadable archive fails its job; anything else (MongoDB, model) is retried
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error, lzma.LZMAError)
+# Zip members can fail one at a time (encrypted, unsupported compression, bad CRC) without ending the job
+MEMBER_ERRORS = (zipfile.BadZipFile, RuntimeError, NotImplementedError, zlib.error)
+DUPLICATE_KEY = 11000
+
+
+class JobEntry(NamedTuple):
+    """One image read from a job archive, or the reason it couldn't be read"""
+    index: int
+    filename: str
+    data: Optional[bytes]
+    sha256: Optional[str]
+    error: Optional[str]
+
+
+def _is_image(name: str) -> bool:
+    base = os.path.basename(name)
+    # Skip macOS resource forks and other hidden files that archivers add
+    if not base or base.startswith(".") or "__MACOSX/" in name:
+        return False
+    return os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+
+def archive_format(path: str) -> Optional[str]:
+    """'zip' or 'tar' (plain or gz/bz2/xz compressed), or None if it is neither"""
+    if zipfile.is_zipfile(path):
+        return "zip"
+    if tarfile.is_tarfile(path):
+        return "tar"
+    return None
+
+
+def count_images(path: str) -> Optional[int]:
+    """Images in a zip, read from its central directory; None for tars, which would need a full pass"""
+    if archive_format(path) != "zip":
+        return None
+    with zipfile.ZipFile(path) as archive:
+        return sum(1 for info in archive.infolist() if not info.is_dir() and _is_image(info.filename))
+
+
+def _archive_members(path: str, fmt: str) -> Iterator[tuple]:
+    """(name, declared size, open function) for every regular file, in archive order"""
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: archive.open(info)
+    else:
+        # Stream mode: members are decompressed in order and never seeked back to
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, member.size, lambda member=member: archive.extractfile(member)
+
+
+class ArchiveReader:
+    """
+    Reads a job archive one batch at a time with streaming decompression, so
+    only the current batch's compressed images are ever held in memory.
+    Entries before `start` (already graded before a restart) are skipped
+    without being read. Blocking: call next_batch() off the event loop.
+    """
+
+    def __init__(self, path: str, fmt: str, start: int = 0, images_only: bool = True):
+        self._entries = self._read(path, fmt, start, images_only)
+
+    def _read(self, path: str, fmt: str, start: int, images_only: bool) -> Iterator[JobEntry]:
+        index = 0
+        for name, size, open_member in _archive_members(path, fmt):
+            if images_only and not _is_image(name):
+                continue
+            index += 1
+            if index <= start:
+                continue
+            if size > MAX_UPLOAD_BYTES:
+                yield JobEntry(index - 1, name, None, None, f"Image exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB upload limit")
+                continue
+            try:
+                with open_member() as member:
+                    # Declared sizes can lie, so never read past the limit
+                    data = member.read(MAX_UPLOAD_BYTES + 1)
+            except MEMBER_ERRORS as e:
+                if fmt != "zip":
+                    raise
+                yield JobEntry(index - 1, name, None, None, f"Could not extract: {e}")
+                continue
+            if len(data) > MAX_UPLOAD_BYTES:
+                yield JobEntry(index - 1, name, None, None, f"Image exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB upload limit")
+                continue
+            try:
+                check_image(io.BytesIO(data))
+            except HTTPException as e:
+                yield JobEntry(index - 1, name, None, None, e.detail)
+                continue
+            yield JobEntry(index - 1, name, data, hashlib.sha256(data).hexdigest(), None)
+
+    def next_batch(self, max_files: int, max_bytes: int) -> List[JobEntry]:
+        """Up to `max_files` entries totalling about `max_bytes`; empty once the archive is exhausted"""
+        batch, held = [], 0
+        for entry in self._entries:
+            batch.append(entry)
+            held += len(entry.data or b"")
+            if len(batch) >= max_files or held >= max_bytes:
+                break
+        return batch
+
+    def close(self):
+        self._entries.close()
+
+
+def job_summary(job: dict) -> dict:
+    """The API view of a `jobs` document"""
+    return {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "filename": job.get("filename"),
+        "total": job.get("total"),
+        "processed": job.get("processed", 0),
+        "succeeded": job.get("succeeded", 0),
+        "failed": job.get("failed", 0),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+class JobRunner:
+    """
+    Background grading of whole archives. Submitted jobs are stored in the
+    `jobs` collection and claimed by whichever worker is free, under a lease
+    renewed for every batch and while it is graded. Each batch's results are
+    written to `job_results` before the checkpoint moves past it, so a job whose
+    worker restarts or dies is resumed by the next claimant from its last
+    checkpoint. A job claimed JOB_MAX_ATTEMPTS times without reaching a
+    checkpoint is failed rather than retried forever.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = uuid.uuid4().hex
+        self._db = None
+        self._predict_batch: Optional[Callable[..., Awaitable[list]]] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.images = 0
+
+    def start(self, db, predict_batch: Callable[[List[Union[bytes, str]], Optional[List[str]]], Awaitable[list]]):
+        """Start claiming jobs on the running event loop; `predict_batch` grades a list of images"""
+        self._db = db
+        self._predict_batch = predict_batch
+        if not self._workers:
+            self._wake = asyncio.Event()
+            self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Stop grading and hand this worker's jobs back so a restarted worker resumes them at once"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._db is not None:
+            try:
+                await self._db[JOBS_COLLECTION].update_many(
+                    {"worker": self.worker_id, "status": "running"},
+                    # A handed-back job hasn't used up an attempt
+                    {"$set": {"lease_until": datetime.utcnow(), "worker": None}, "$inc": {"attempts": -1}}
+                )
+            except Exception as e:
+                logger.error(f"Could not release running jobs: {e}")
+
+    def notify(self):
+        """A job was just submitted; wake an idle worker instead of waiting for the next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def submit(self, job_id: str, archive_path: str, fmt: str, filename: Optional[str],
+                     total: Optional[int], user_id: Optional[str], source: str) -> dict:
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "user_id": user_id,
+            "status": "queued",
+            "source": source,
+            "filename": filename,
+            "format": fmt,
+            "archive_path": archive_path,
+            "total": total,
+            "processed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "error": None,
+            "attempts": 0,
+            "worker": None,
+            # Already expired, so any worker may claim it
+            "lease_until": now,
+            "created_at": now,
+            "updated_at": now,
+            # started_at is set by the first claim ($min leaves an existing value alone)
+            "finished_at": None,
+        }
+        await self._db[JOBS_COLLECTION].insert_one(job)
+        self.notify()
+        return job
+
+    async def _claim(self) -> Optional[dict]:
+        """Atomically take the oldest queued job, or a running one whose worker stopped checkpointing"""
+        now = datetime.utcnow()
+        return await self._db[JOBS_COLLECTION].find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": self.worker_id,
+                    "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                },
+                "$min": {"started_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _renew_lease(self, job_id: str, fields: Optional[dict] = None) -> bool:
+        """Extend this worker's lease, saving `fields` with it; False if another worker took the job over"""
+        now = datetime.utcnow()
+        update = await self._db[JOBS_COLLECTION].update_one(
+            {"_id": job_id, "worker": self.worker_id},
+            {"$set": {**(fields or {}), "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now}}
+        )
+        return update.matched_count > 0
+
+    async def _hold_lease(self, job_id: str):
+        """Keep the lease while a batch waits for room in the inference pipeline and is graded"""
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                if not await self._renew_lease(job_id):
+                    return
+            except Exception as e:
+                logger.error(f"Could not renew the lease on job {job_id}: {e}")
+
+    async def _save_results(self, documents: List[dict]):
+        """Insert a batch's results, skipping any a previous claimant of the job already stored"""
+        try:
+            await self._db[JOB_RESULTS_COLLECTION].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])) \
+                    or e.details.get("writeConcernErrors"):
+                raise
+
+    async def _run(self):
+        while True:
+            job = None
+            if model_registry.state == "ready":
+                self._wake.clear()
+                try:
+                    job = await self._claim()
+                except Exception as e:
+                    logger.error(f"Could not claim a job: {e}")
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.active += 1
+            try:
+                await self._process(job)
+            except Exception as e:
+                # Left running under its lease, so it is picked up again once the lease runs out
+                logger.error(f"Job {job['_id']} interrupted, will resume from its checkpoint: {e}")
+            finally:
+                self.active -= 1
+
+    async def _process(self, job: dict):
+        results = self._db[JOB_RESULTS_COLLECTION]
+        job_id = job["_id"]
+        counts = {name: job.get(name, 0) for name in ("processed", "succeeded", "failed")}
+        if job.get("attempts", 0) > JOB_MAX_ATTEMPTS:
+            logger.error(f"Job {job_id} failed: no progress after {JOB_MAX_ATTEMPTS} attempts")
+            await self._finish(job, counts, "failed", f"Stopped after {JOB_MAX_ATTEMPTS} attempts without progress")
+            return
+        if counts["processed"]:
+            logger.info(f"Resuming job {job_id} after {counts['processed']} images")
+
+        reader = None
+        try:
+            # Results past the checkpoint belong to a run that stopped before recording it
+            await results.delete_many({"job_id": job_id, "index": {"$gte": counts["processed"]}})
+            reader = ArchiveReader(
+                job["archive_path"], job["format"], counts["processed"], images_only=job["source"] == "archive"
+            )
+            batch_files = min(JOB_BATCH_SIZE, max_batch_files())
+            while True:
+                batch = await asyncio.to_thread(reader.next_batch, batch_files, JOB_BATCH_MEMORY_BYTES)
+                if not batch:
+                    break
+                if not await self._renew_lease(job_id):
+                    logger.warning(f"Job {job_id} was taken over by another worker")
+                    return
+                holder = asyncio.create_task(self._hold_lease(job_id))
+                try:
+                    documents = await self._grade(batch, job)
+                finally:
+                    holder.cancel()
+                await self._save_results(documents)
+                succeeded = sum(1 for document in documents if document["success"])
+                counts["processed"] += len(documents)
+                counts["succeeded"] += succeeded
+                counts["failed"] += len(documents) - succeeded
+                self.images += len(documents)
+
+                # Checkpoint and renew the lease; progress resets the attempt count to this claim
+                if not await self._renew_lease(job_id, {**counts, "attempts": 1}):
+                    logger.warning(f"Job {job_id} was taken over by another worker")
+                    return
+            status, error = "completed", None
+        except ARCHIVE_ERRORS as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            status, error = "failed", str(e)
+        finally:
+            if reader is not None:
+                reader.close()
+        await self._finish(job, counts, status, error)
+
+    async def _finish(self, job: dict, counts: dict, status: str, error: Optional[str]):
+        """Record the job's outcome and delete its archive"""
+        now = datetime.utcnow()
+        fields = {**counts, "status": status, "error": error, "updated_at": now, "finished_at": now, "worker": None}
+        if status == "completed":
+            fields["total"] = counts["processed"]
+        await self._db[JOBS_COLLECTION].update_one({"_id": job["_id"], "worker": self.worker_id}, {"$set": fields})
+        if status == "completed":
+            self.completed += 1
+        else:
+            self.failed += 1
+        shutil.rmtree(os.path.dirname(job["archive_path"]), ignore_errors=True)
+
+    async def _grade(self, batch: List[JobEntry], job: dict) -> List[dict]:
+        """Classify the readable images in one forward pass; a `job_results` document per entry"""
+        readable = [entry for entry in batch if entry.error is None]
+        predictions = []
+        if readable:
+            # Background work yields to interactive requests instead of getting a 503
+            while pending_images() + len(readable) > MAX_PENDING_IMAGES:
+                await asyncio.sleep(RETRY_AFTER_SECONDS)
+            async with inference_slot(len(readable)):
+                predictions = await self._predict_batch(
+                    [entry.data for entry in readable], [entry.sha256 for entry in readable]
+                )
+        outcomes = dict(zip((entry.index for entry in readable), predictions))
+
+        documents = []
+        for entry in batch:
+            document = {"_id": ObjectId(), "job_id": job["_id"], "index": entry.index, "filename": entry.filename}
+            outcome = outcomes.get(entry.index)
+            if entry.error is not None or isinstance(outcome, BaseException):
+                document.update({"success": False, "error": entry.error or str(outcome)})
+            else:
+                prediction_id = str(uuid.uuid4())
+                prediction_writer.record(prediction_record(
+                    outcome, prediction_id, entry.filename, entry.sha256, job.get("user_id"), "job"
+                ))
+                document.update({"success": True, "prediction_id": prediction_id, "prediction": outcome})
+            documents.append(document)
+        return documents
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "images": self.images,
+        }
+
+
+job_runner = JobRunner()
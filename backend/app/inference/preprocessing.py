@@ -0,0 +1,60 @@
+import io
+from typing import List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+# Input size the CNN was trained on
+IMG_HEIGHT, IMG_WIDTH = 150, 150
+_SCALE = np.float32(1.0 / 255.0)
+
+
+def load_image(fp) -> Image.Image:
+    """
+    Open an image and decode it as RGB. For JPEGs, draft() lets libjpeg
+    downscale by up to 8x during decoding, so a 12MP phone photo is never
+    materialized at full resolution.
+    """
+    image = Image.open(fp)
+    if image.format == 'JPEG':
+        image.draft('RGB', (IMG_WIDTH, IMG_HEIGHT))
+    return image.convert('RGB')
+
+
+def resize_pixels(image: Image.Image) -> np.ndarray:
+    """Resize to the model's input size and return the raw H x W x 3 uint8 pixels"""
+    if image.size != (IMG_WIDTH, IMG_HEIGHT):
+        image = image.resize((IMG_WIDTH, IMG_HEIGHT), Image.Resampling.BICUBIC)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def normalize_into(pixels: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Scale uint8 pixels to [0, 1] directly into a float32 buffer, without a float64 temporary"""
+    return np.multiply(pixels, _SCALE, out=out, dtype=np.float32)
+
+
+def preprocess_batch(pixel_arrays: List[np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Normalize decoded images into one preallocated N x H x W x 3 float32 batch"""
+    if out is None:
+        out = np.empty((len(pixel_arrays), IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+    for i, pixels in enumerate(pixel_arrays):
+        normalize_into(pixels, out[i])
+    return out
+
+
+def preprocess_image(image: Image.Image) -> np.ndarray:
+    """Preprocess image for model prediction"""
+    return preprocess_batch([resize_pixels(image)])
+
+
+def decode_image(source: Union[bytes, str]) -> np.ndarray:
+    """
+    Decode an uploaded image into model-sized uint8 pixels. `source` is the
+    raw bytes for small uploads or the path of the spooled temp file for large
+    ones, so big files are read from disk here instead of being pickled over.
+    Runs inside the decode process pool, so it must stay importable without
+    TensorFlow; returning uint8 keeps the transfer back 4x smaller than float32.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return resize_pixels(load_image(source))
@@ -0,0 +1,256 @@
+import asyncio
+import gc
+import json
+import logging
+import os
+import pickle
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from app.inference.backends import InferenceBackend, load_backend
+from app.inference.cache import fingerprint_file, prediction_cache
+from app.inference.executors import run_model_load
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# Legacy single-model layout: backend/models/{fruit_quality_cnn_model.h5, class_indices.pkl, label_mapping.pkl}
+MODELS_DIR = Path(__file__).parent.parent.parent / "models"
+# Versioned layout: one sub-directory per version holding the same three artifacts
+MODEL_REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", MODELS_DIR / "registry"))
+# Version to serve at startup; defaults to the ACTIVE marker, then the newest version
+MODEL_VERSION = os.getenv("MODEL_VERSION", "")
+# How long a replaced model may keep serving in-flight requests before it is released
+MODEL_DRAIN_TIMEOUT = float(os.getenv("MODEL_DRAIN_TIMEOUT", 30))
+# How often each worker checks the ACTIVE marker for swaps made by another worker
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 5))
+
+DEFAULT_VERSION = "default"
+ACTIVE_MARKER = "ACTIVE"
+
+
+class LoadedModel:
+    """One model version in memory, with a count of requests currently using it"""
+
+    def __init__(self, version: str, backend: InferenceBackend, class_indices: dict, label_mapping: dict):
+        self.version = version
+        self.backend = backend
+        self.class_indices = class_indices
+        self.label_mapping = label_mapping
+        # Cached predictions are only valid for the exact weights that produced them
+        self.fingerprint = f"{version}:{fingerprint_file(backend.model_path)}"
+        self.loaded_at = datetime.utcnow()
+        self.in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    def acquire(self):
+        self.in_flight += 1
+        self._drained.clear()
+
+    def release(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._drained.set()
+
+    async def wait_drained(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        backend = self.backend
+        if backend is None:
+            # Released after MODEL_DRAIN_TIMEOUT while this request still held it
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Model version {self.version} was swapped out, please retry",
+                headers={"Retry-After": "1"},
+            )
+        return backend.predict(img_batch)
+
+    def warm_up(self, batch_sizes):
+        """Run dummy batches so graph tracing and kernel setup happen before real requests"""
+        for batch_size in sorted(set(batch_sizes)):
+            self.backend.predict(np.zeros((batch_size, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32))
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "backend": self.backend.name,
+            "precision": self.backend.precision,
+            "fingerprint": self.fingerprint,
+            "loaded_at": self.loaded_at.isoformat(),
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on disk plus the one version currently serving.
+    Activating a version loads and warms it next to the current one, swaps the
+    active reference atomically, then waits for requests still holding the old
+    model to finish before releasing it.
+    """
+
+    def __init__(self, registry_dir: Path = MODEL_REGISTRY_DIR, legacy_dir: Path = MODELS_DIR):
+        self.registry_dir = Path(registry_dir)
+        self.legacy_dir = Path(legacy_dir)
+        self.active: Optional[LoadedModel] = None
+        # Readiness, separate from process liveness: loading -> warming -> ready (or failed)
+        self.state = "loading"
+        self.warm_up_batch_sizes = [1]
+        self._swap_lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        # Replaced models waiting to drain, referenced so the tasks aren't garbage-collected
+        self._retiring = set()
+        self._failed_marker: Optional[str] = None
+
+    def version_dir(self, version: str) -> Path:
+        if version == DEFAULT_VERSION:
+            return self.legacy_dir
+        path = (self.registry_dir / version).resolve()
+        # Version names come from the admin API, keep them inside the registry
+        if path.parent != self.registry_dir.resolve() or not path.is_dir():
+            raise KeyError(version)
+        return path
+
+    def versions(self) -> List[dict]:
+        """Every version available on disk, newest first"""
+        versions = []
+        if self.registry_dir.is_dir():
+            for path in self.registry_dir.iterdir():
+                if path.is_dir() and (path / "label_mapping.pkl").exists():
+                    metadata_path = path / "metadata.json"
+                    metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+                    versions.append({
+                        "version": path.name,
+                        "created_at": datetime.utcfromtimestamp(path.stat().st_mtime).isoformat(),
+                        "metadata": metadata,
+                    })
+        versions.sort(key=lambda v: v["created_at"], reverse=True)
+        if (self.legacy_dir / "label_mapping.pkl").exists():
+            versions.append({"version": DEFAULT_VERSION, "created_at": None, "metadata": {}})
+        for v in versions:
+            v["active"] = self.active is not None and self.active.version == v["version"]
+        return versions
+
+    def marked_version(self) -> Optional[str]:
+        marker = self.registry_dir / ACTIVE_MARKER
+        if marker.exists():
+            return marker.read_text().strip() or None
+        return None
+
+    def initial_version(self) -> str:
+        if MODEL_VERSION:
+            return MODEL_VERSION
+        marked = self.marked_version()
+        if marked:
+            return marked
+        versions = self.versions()
+        return versions[0]["version"] if versions else DEFAULT_VERSION
+
+    def _load(self, version: str) -> LoadedModel:
+        models_dir = self.version_dir(version)
+        backend = load_backend(models_dir)
+        with open(models_dir / "class_indices.pkl", 'rb') as f:
+            class_indices = pickle.load(f)
+        with open(models_dir / "label_mapping.pkl", 'rb') as f:
+            label_mapping = pickle.load(f)
+        logger.info(f"Model version {version} loaded from {models_dir}")
+        return LoadedModel(version, backend, class_indices, label_mapping)
+
+    async def activate(self, version: str, persist: bool = True) -> LoadedModel:
+        """
+        Load, warm up and atomically swap in `version`; raises KeyError if it doesn't exist.
+        Loading runs on the model loader thread, so predictions on the current
+        model keep flowing until the swap itself, which happens on the event loop.
+        """
+        async with self._swap_lock:
+            self.version_dir(version)
+            first_load = self.active is None
+            if first_load:
+                self.state = "loading"
+            try:
+                loaded = await run_model_load(self._load, version)
+                if first_load:
+                    self.state = "warming"
+                await run_model_load(loaded.warm_up, self.warm_up_batch_sizes)
+            except Exception:
+                if first_load:
+                    self.state = "failed"
+                raise
+
+            previous, self.active = self.active, loaded
+            prediction_cache.set_model_fingerprint(loaded.fingerprint)
+            self.state = "ready"
+            if persist and self.registry_dir.is_dir():
+                (self.registry_dir / ACTIVE_MARKER).write_text(version)
+            logger.info(f"Model version {version} is now active")
+
+        if previous is not None:
+            task = asyncio.create_task(self._retire(previous))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        return loaded
+
+    async def _retire(self, previous: LoadedModel):
+        if not await previous.wait_drained(MODEL_DRAIN_TIMEOUT):
+            logger.warning(
+                f"Model version {previous.version} still has {previous.in_flight} requests "
+                f"after {MODEL_DRAIN_TIMEOUT}s, releasing anyway"
+            )
+        previous.backend = None
+        gc.collect()
+        logger.info(f"Model version {previous.version} released")
+
+    @asynccontextmanager
+    async def use(self):
+        """Hold the active model for the duration of a request so a swap can't release it underneath"""
+        loaded = self.active
+        if loaded is None:
+            raise RuntimeError("Model not loaded")
+        loaded.acquire()
+        try:
+            yield loaded
+        finally:
+            loaded.release()
+
+    async def start(self):
+        """Load the initial version, then follow swaps made by other workers"""
+        version = self.initial_version()
+        try:
+            await self.activate(version, persist=False)
+        except Exception as e:
+            logger.error(f"Error loading model version {version}: {e}")
+            self.state = "failed"
+            return
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(MODEL_WATCH_INTERVAL)
+            marked = self.marked_version()
+            if not marked or marked == self._failed_marker or self._swap_lock.locked():
+                continue
+            if self.active is not None and marked != self.active.version:
+                logger.info(f"ACTIVE marker changed to {marked}, swapping")
+                try:
+                    await self.activate(marked, persist=False)
+                except Exception as e:
+                    logger.error(f"Error activating model version {marked}: {e}")
+                    self._failed_marker = marked
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+
+model_registry = ModelRegistry()
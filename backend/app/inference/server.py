@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing.connection import Listener
+from pathlib import Path
+
+import numpy as np
+
+from app.inference.backends import load_backend
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# Model versions kept loaded at once: the active one and the one being swapped out
+MAX_LOADED_VERSIONS = int(os.getenv("INFERENCE_SERVER_MAX_VERSIONS", 2))
+
+
+class BackendPool:
+    """Backends keyed by model directory, loaded on first use and evicted least-recently-used"""
+
+    def __init__(self, backend_kwargs: dict):
+        self.backend_kwargs = backend_kwargs
+        self._backends = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, models_dir: str):
+        with self._lock:
+            backend = self._backends.get(models_dir)
+            if backend is not None:
+                self._backends.move_to_end(models_dir)
+                return backend
+
+        # Load outside the lock so the active version keeps serving while a new one loads
+        backend = load_backend(Path(models_dir), **self.backend_kwargs)
+        backend.predict(np.zeros((1, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32))
+        with self._lock:
+            backend = self._backends.setdefault(models_dir, backend)
+            self._backends.move_to_end(models_dir)
+            while len(self._backends) > MAX_LOADED_VERSIONS:
+                evicted, _ = self._backends.popitem(last=False)
+                logger.info(f"Released model from {evicted}")
+            return backend
+
+def _handle(conn, pool: BackendPool):
+    """Serve one worker connection until it closes"""
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+            command, models_dir = request[0], request[1]
+            try:
+                backend = pool.get(models_dir)
+                if command == "predict":
+                    conn.send(("ok", backend.predict(request[2])))
+                elif command == "describe":
+                    conn.send(("ok", {
+                        **backend.describe(),
+                        "name": backend.name,
+                        "precision": backend.precision,
+                        "model_path": str(backend.model_path),
+                    }))
+                else:
+                    conn.send(("error", f"Unknown command {command!r}"))
+            except Exception as e:
+                logger.error(f"Inference server error: {e}")
+                conn.send(("error", str(e)))
+
+
+def serve(socket_path: str, authkey: bytes, backend_name: str = None, precision: str = None):
+    """
+    Hold the model weights once and answer predict calls from uvicorn workers
+    over a Unix socket, so N workers share one copy. Workers name the model
+    version directory in every call, which lets hot swaps load the new
+    version here alongside the old one.
+    """
+    logging.basicConfig(level=logging.INFO)
+    kwargs = {}
+    if backend_name:
+        kwargs["backend_name"] = backend_name
+    if precision:
+        kwargs["precision"] = precision
+    pool = BackendPool(kwargs)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with Listener(socket_path, family="AF_UNIX", authkey=authkey) as listener:
+        logger.info(f"Inference server listening on {socket_path}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # A client that fails the authkey handshake shouldn't take the server down
+                logger.warning(f"Rejected inference client: {e}")
+                continue
+            threading.Thread(target=_handle, args=(conn, pool), daemon=True).start()
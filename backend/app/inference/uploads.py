@@ -0,0 +1,230 @@
+import hashlib
+import io
+import logging
+import os
+import resource
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+from app.utils.metrics import inference_stage_duration
+
+logger = logging.getLogger(__name__)
+
+# Largest upload accepted per image, and how much of it may sit in memory before spilling to disk
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", 20))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_KB", 1024)) * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Allowance for multipart boundaries, part headers and form fields on top of the file limits
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+# Decompression-bomb guard: refuse images whose header declares more pixels than this
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+
+
+class UploadStats:
+    """Upload memory accounting for /api/inference/stats"""
+
+    def __init__(self):
+        self.bytes_in_memory = 0
+        self.peak_bytes_in_memory = 0
+        self.spooled_to_disk = 0
+        self.rejected_too_large = 0
+        self.rejected_dimensions = 0
+
+    def hold(self, size: int):
+        self.bytes_in_memory += size
+        self.peak_bytes_in_memory = max(self.peak_bytes_in_memory, self.bytes_in_memory)
+
+    def free(self, size: int):
+        self.bytes_in_memory -= size
+
+    def snapshot(self) -> dict:
+        return {
+            "bytes_in_memory": self.bytes_in_memory,
+            "peak_bytes_in_memory": self.peak_bytes_in_memory,
+            "spooled_to_disk": self.spooled_to_disk,
+            "rejected_too_large": self.rejected_too_large,
+            "rejected_dimensions": self.rejected_dimensions,
+            # ru_maxrss is reported in KB on Linux
+            "process_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+
+
+upload_stats = UploadStats()
+
+
+def read_header(fp) -> Tuple[str, Tuple[int, int]]:
+    """Format and dimensions from an image header, without decoding any pixels"""
+    with Image.open(fp) as image:
+        return image.format, image.size
+
+
+def check_image(fp):
+    """Reject files that aren't images or whose declared size is a decompression bomb"""
+    try:
+        _, (width, height) = read_header(fp)
+        too_large = width * height > MAX_IMAGE_PIXELS
+    except Image.DecompressionBombError:
+        # PIL's own guard fires first for headers far beyond its default limit
+        width = height = None
+        too_large = True
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a readable image")
+    if too_large:
+        upload_stats.rejected_dimensions += 1
+        declared = f"{width}x{height}" if width else "declared"
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image dimensions {declared} exceed the {MAX_IMAGE_PIXELS} pixel limit"
+        )
+
+
+class UploadSpool:
+    """
+    An upload copied chunk by chunk into a bounded buffer: it stays in memory
+    up to UPLOAD_SPOOL_MEMORY_BYTES, then rolls over to a temp file. Works like
+    tempfile.SpooledTemporaryFile, except the rolled-over file has a path, so
+    a decode worker process can open it instead of receiving the bytes.
+    """
+
+    def __init__(self, max_bytes: int = MAX_UPLOAD_BYTES, memory_bytes: int = UPLOAD_SPOOL_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self.sha256 = None
+        self._buffer = bytearray()
+        self._file = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self._file is None
+
+    def _write(self, chunk: bytes):
+        if self._file is None and len(self._buffer) + len(chunk) > self.memory_bytes:
+            self._file = tempfile.NamedTemporaryFile(prefix="gradefresh-upload-", delete=False)
+            self._file.write(self._buffer)
+            upload_stats.free(len(self._buffer))
+            upload_stats.spooled_to_disk += 1
+            self._buffer = bytearray()
+        if self._file is None:
+            self._buffer += chunk
+            upload_stats.hold(len(chunk))
+        else:
+            self._file.write(chunk)
+
+    async def fill(self, upload: UploadFile):
+        """Copy the upload in chunks, hashing as we go and stopping as soon as it is too large"""
+        digest = hashlib.sha256()
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                upload_stats.rejected_too_large += 1
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Image exceeds the {self.max_bytes // (1024 * 1024)}MB upload limit"
+                )
+            digest.update(chunk)
+            self._write(chunk)
+        self.sha256 = digest.hexdigest()
+        if self._file is not None:
+            self._file.flush()
+
+    def source(self) -> Union[bytes, str]:
+        """What the decode worker should open: the bytes when small, the temp file path otherwise"""
+        return bytes(self._buffer) if self._file is None else self._file.name
+
+    def check_image(self):
+        """Reject files that aren't images or whose declared size is a decompression bomb"""
+        fp = io.BytesIO(self._buffer) if self._file is None else open(self._file.name, 'rb')
+        try:
+            check_image(fp)
+        finally:
+            fp.close()
+
+    def close(self):
+        upload_stats.free(len(self._buffer))
+        self._buffer = bytearray()
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self._file.name)
+            except OSError:
+                pass
+            self._file = None
+
+
+@asynccontextmanager
+async def spool_upload(upload: UploadFile, max_bytes: Optional[int] = None):
+    """Spool and validate an uploaded image; the buffer is released when the block exits"""
+    spool = UploadSpool(max_bytes or MAX_UPLOAD_BYTES)
+    try:
+        with inference_stage_duration.time(stage="upload_read"):
+            await spool.fill(upload)
+            spool.check_image()
+        yield spool
+    finally:
+        spool.close()
+
+
+def _body_too_large(max_bytes: int) -> str:
+    return f"Request body exceeds the {max_bytes // (1024 * 1024)}MB limit"
+
+
+class RequestBodyLimit:
+    """
+    ASGI middleware that refuses oversized uploads before FastAPI parses the
+    multipart form, which would otherwise spool the whole body first. A
+    Content-Length over the limit gets a 413 without any of the body being
+    read; a chunked body is counted as it arrives and cut off with a 413 once
+    it passes the limit. `limits` maps a POST path to a function returning its
+    limit in bytes; other requests pass straight through.
+    """
+
+    def __init__(self, app, limits: Dict[str, Callable[[], int]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = self.limits.get(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = limit()
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > max_bytes:
+            upload_stats.rejected_too_large += 1
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": _body_too_large(max_bytes)},
+                headers={"Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    upload_stats.rejected_too_large += 1
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=_body_too_large(max_bytes)
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
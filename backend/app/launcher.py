@@ -0,0 +1,92 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import secrets
+import sys
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+# Allow `python app/launcher.py` as well as `python -m app.launcher`
+sys.path.append(str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+
+def split_per_worker(name: str, node_total: int, workers: int) -> int:
+    """
+    Treat a pool size setting as the budget for the whole node and give each
+    worker its share, so N workers don't start N full-size pools
+    """
+    total = int(os.getenv(name, node_total))
+    share = max(1, total // workers)
+    os.environ[name] = str(share)
+    return share
+
+
+def main():
+    """
+    Start the GradeFresh API.
+
+    With one worker the model is loaded inside the uvicorn process as before.
+    With several workers the model is loaded once in a dedicated inference
+    server process, and every uvicorn worker forwards batches to it over a
+    Unix socket, so memory no longer grows with the worker count. The decode
+    pool and inference threads are split across the workers the same way.
+    """
+    parser = argparse.ArgumentParser(description="Run the GradeFresh API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 1)),
+        help="uvicorn worker processes (default: WEB_CONCURRENCY or 1)"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port)
+        return
+
+    from app.inference.server import serve
+
+    # Private directory for the socket plus a random key, so only our workers can connect
+    socket_dir = tempfile.mkdtemp(prefix="gradefresh-")
+    socket_path = os.getenv("INFERENCE_SOCKET") or os.path.join(socket_dir, "inference.sock")
+    authkey = secrets.token_hex(32)
+    backend_name = os.getenv("INFERENCE_BACKEND", "keras").lower()
+    if backend_name == "remote":
+        backend_name = "keras"
+
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve,
+        args=(socket_path, bytes.fromhex(authkey)),
+        kwargs={"backend_name": backend_name},
+        name="inference-server",
+        daemon=True,
+    )
+    server.start()
+    logger.info(f"Started inference server (pid {server.pid}) for {args.workers} workers")
+
+    # Workers are spawned fresh and read these when they import the backends
+    os.environ["INFERENCE_BACKEND"] = "remote"
+    os.environ["INFERENCE_SOCKET"] = socket_path
+    os.environ["INFERENCE_AUTHKEY"] = authkey
+    decode_processes = split_per_worker("DECODE_PROCESSES", os.cpu_count() or 1, args.workers)
+    inference_threads = split_per_worker("INFERENCE_THREADS", 1, args.workers)
+    logger.info(f"Each worker runs {decode_processes} decode processes and {inference_threads} inference threads")
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        server.terminate()
+        server.join(timeout=10)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        if not os.listdir(socket_dir):
+            os.rmdir(socket_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -266,19 +266,19 @@
 #     import uvicorn
 #     uvicorn.run(app, host="0.0.0.0", port=8000)
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, File, Request, Response, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import tensorflow as tf
-from tensorflow.keras.models import load_model
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
 import numpy as np
-from PIL import Image
 import io
-import pickle
-from typing import List
-import os
+from typing import List, Optional, Union
 from datetime import datetime
+import json
 import uuid
+import time
 import logging
 import sys
 from pathlib import Path
@@ -286,23 +286,70 @@ from pathlib import Path
 # Add the parent directory to Python path to import routes
 sys.path.append(str(Path(__file__).parent.parent))
 
+from app.database.indexes import ensure_indexes
+from app.database import mongodb
+from app.database.mongodb import get_database
+from app.database.predictions import prediction_record, prediction_writer
+from app.inference.augment import TTA_CONFIDENCE_THRESHOLD, augment_pixels, average_views
+from app.inference.batcher import MicroBatcher
+from app.inference.cache import hash_image, prediction_cache
+from app.inference.executors import (
+    MAX_PENDING_IMAGES, inference_slot, max_batch_files, pending_images, run_decode, run_inference, shutdown_executors
+)
+from app.inference.preprocessing import (
+    IMG_HEIGHT, IMG_WIDTH, decode_image, preprocess_batch
+)
+from app.inference.frames import WS_MAX_CONNECTIONS, WS_MAX_FPS, FrameStream, stream_stats
+from app.inference.jobs import MAX_JOB_ARCHIVE_BYTES, job_runner
+from app.inference.registry import LoadedModel, model_registry
+from app.inference.uploads import (
+    MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, RequestBodyLimit, check_image, spool_upload, upload_stats
+)
+from app.models.user import UserPrincipal
+from app.utils.security import get_optional_user
+from app.utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY,
+    http_request_duration, inference_batch_size, inference_stage_duration, predictions_by_class
+)
+
 # Import your existing routers
 try:
-    from app.routes import auth, admin, news
+    from app.routes import auth, admin, news, predictions, jobs
 except ImportError:
     # Fallback if routes don't exist yet
     auth = None
     admin = None
     news = None
+    predictions = None
+    jobs = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    yield
+    await shutdown_event()
+
 app = FastAPI(
     title="GradeFresh API", 
     description="API for fruit quality classification and user management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Refuse oversized uploads before the multipart form is parsed and spooled.
+# Added ahead of CORS so a 413 still carries the CORS headers.
+app.add_middleware(
+    RequestBodyLimit,
+    limits={
+        "/api/predict": lambda: MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/predict-batch": lambda: max_batch_files() * MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/predict-batch/stream": lambda: max_batch_files() * MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/jobs": lambda: MAX_JOB_ARCHIVE_BYTES + MULTIPART_OVERHEAD_BYTES,
+    }
 )
 
 # CORS middleware
@@ -312,8 +359,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginated listings return the next page's cursor in a header
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Request latency per route template (not raw path, so IDs don't explode the label set)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status_code
+        )
+
 # Include routers if they exist
 if auth:
     app.include_router(auth.router, prefix="/api", tags=["Authentication"])
@@ -321,58 +388,202 @@ if admin:
     app.include_router(admin.router, prefix="/api", tags=["Admin"])
 if news:
     app.include_router(news.router, prefix="/api", tags=["News"])
+if predictions:
+    app.include_router(predictions.router, prefix="/api", tags=["Predictions"])
+if jobs:
+    app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+
+# Versioned models: model_registry.active is the LoadedModel currently serving
+# (an InferenceBackend plus its class_indices / label_mapping)
+img_height, img_width = IMG_HEIGHT, IMG_WIDTH
 
-# Global variables for model and mappings
-model = None
-class_indices = {}
-label_mapping = {}
-img_height, img_width = 150, 150
+def classify_pixels(active: LoadedModel, pixel_arrays: List[np.ndarray]) -> np.ndarray:
+    """Normalize decoded uint8 images into one float32 batch and run the model"""
+    inference_batch_size.observe(len(pixel_arrays))
+    with inference_stage_duration.time(stage="preprocess"):
+        img_batch = preprocess_batch(pixel_arrays)
+    with inference_stage_duration.time(stage="predict"):
+        return active.predict(img_batch)
 
-def load_models():
-    """Load the trained model and mappings"""
-    global model, class_indices, label_mapping
+async def decode_upload(source: Union[bytes, str]) -> np.ndarray:
+    """Decode one image in the decode process pool, timing the round trip"""
+    with inference_stage_duration.time(stage="decode"):
+        return await run_decode(decode_image, source)
+
+# Shared queue that groups concurrent /api/predict requests into one forward pass
+batcher = MicroBatcher(classify_pixels)
+model_registry.warm_up_batch_sizes = [1, batcher.max_batch_size]
+model_task = None
+index_task = None
+
+def require_model():
+    """Reject inference requests until the model is loaded and warmed up"""
+    if model_registry.state != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded",
+            headers={"Retry-After": "5"} if model_registry.state != "failed" else None
+        )
+
+# Load model on startup without blocking the server from accepting requests;
+# TensorFlow is only imported once the backend loads
+async def startup_event():
+    global model_task, index_task
+    batcher.start()
+    model_task = asyncio.create_task(model_registry.start())
+    
+    # Open the MongoDB pool now so the first requests find warm connections.
+    # Motor connects lazily, so an unreachable server is only logged here; a
+    # malformed MONGODB_URL makes connect() raise, which is logged and leaves
+    # the database-backed services (indexes, prediction log, jobs) off.
     try:
-        # Go up one level from app/ to backend/ then to models/
-        models_dir = Path(__file__).parent.parent / "models"
-        model_path = models_dir / "fruit_quality_cnn_model.h5"
-        class_indices_path = models_dir / "class_indices.pkl"
-        label_mapping_path = models_dir / "label_mapping.pkl"
+        mongodb.connect()
+    except Exception as e:
+        logger.error(f"MongoDB client could not be created: {e}")
+        return
+    database_status = await mongodb.ping()
+    if database_status["status"] != "ok":
+        logger.warning(f"MongoDB not reachable at startup: {database_status.get('error')}")
+    
+    # Idempotent; runs alongside model loading and only logs if MongoDB is unreachable
+    index_task = asyncio.create_task(ensure_indexes(get_database()))
+    prediction_writer.start(get_database())
+    # Picks up queued jobs, and resumes interrupted ones from their checkpoint, once the model is ready
+    job_runner.start(get_database(), predict_fruit_quality_batch)
+
+async def shutdown_event():
+    if index_task is not None:
+        index_task.cancel()
+    # Hand running jobs back before the model and database go away
+    await job_runner.stop()
+    await model_registry.stop()
+    await batcher.stop()
+    # Flush buffered predictions before the pool goes away
+    await prediction_writer.stop()
+    mongodb.close()
+    shutdown_executors()
+
+def cache_key(image_hash: str, high_accuracy: bool) -> str:
+    """High-accuracy results are cached apart, so they never answer a standard request or vice versa"""
+    return f"{image_hash}:augmented" if high_accuracy else image_hash
+
+async def refine_uncertain(active: LoadedModel, pixel_arrays: List[np.ndarray], probabilities: np.ndarray):
+    """
+    Test-time augmentation for the rows whose confidence is below
+    TTA_CONFIDENCE_THRESHOLD: flipped and cropped views of every uncertain
+    image go through one forward pass and are averaged with the first pass.
+    Returns the new probabilities and the inference mode of each row.
+    """
+    probabilities = np.array(probabilities, dtype=np.float32, ndmin=2)
+    modes = ["standard"] * len(probabilities)
+    uncertain = [i for i, row in enumerate(probabilities) if row.max() < TTA_CONFIDENCE_THRESHOLD]
+    if not uncertain:
+        return probabilities, modes
+    
+    with inference_stage_duration.time(stage="augment"):
+        views = await asyncio.gather(*(run_decode(augment_pixels, pixel_arrays[i]) for i in uncertain))
+    per_image = len(views[0])
+    view_probabilities = await run_inference(classify_pixels, active, [view for image_views in views for view in image_views])
+    for n, i in enumerate(uncertain):
+        probabilities[i] = average_views(probabilities[i], view_probabilities[n * per_image:(n + 1) * per_image])
+        modes[i] = "augmented"
+    return probabilities, modes
+
+async def predict_fruit_quality(
+    source: Union[bytes, str],
+    image_hash: Optional[str] = None,
+    high_accuracy: bool = False,
+    use_cache: bool = True
+) -> dict:
+    """
+    Predict fruit quality from uploaded image bytes or the path of a spooled upload.
+    With high_accuracy, a low-confidence first pass is refined by test-time augmentation.
+    use_cache=False is for inputs that won't repeat, such as camera frames, which
+    would only evict real uploads from the prediction cache.
+    """
+    # Pin the active model for the whole request so a hot swap drains it first
+    async with model_registry.use() as active:
+        # Identical uploads skip decoding and inference entirely
+        key = None
+        if use_cache:
+            if image_hash is None:
+                image_hash = hash_image(source)
+            key = cache_key(image_hash, high_accuracy)
+            cached = await prediction_cache.get(key, active.fingerprint)
+            if cached is not None:
+                count_prediction(cached)
+                return cached
         
-        logger.info(f"Loading model from: {model_path}")
+        # Decode and preprocess in the decode process pool, off the event loop
+        pixels = await decode_upload(source)
         
-        model = load_model(model_path)
-        with open(class_indices_path, 'rb') as f:
-            class_indices = pickle.load(f)
-        with open(label_mapping_path, 'rb') as f:
-            label_mapping = pickle.load(f)
-        logger.info("Model and mappings loaded successfully!")
-    except Exception as e:
-        logger.error(f"Error loading model: {e}")
+        # Make prediction through the shared batching queue
+        probabilities = await batcher.submit(pixels, active)
+        mode = "standard"
+        if high_accuracy:
+            refined, modes = await refine_uncertain(active, [pixels], probabilities)
+            probabilities, mode = refined[0], modes[0]
+        with inference_stage_duration.time(stage="postprocess"):
+            prediction = format_prediction(probabilities, active, mode)
+        if use_cache:
+            await prediction_cache.put(key, prediction, active.fingerprint)
+        return prediction
 
-# Load model on startup
-@app.on_event("startup")
-async def startup_event():
-    load_models()
-
-def preprocess_image(image: Image.Image) -> np.ndarray:
-    """Preprocess image for model prediction"""
-    # Resize image to match model's expected sizing
-    image = image.resize((img_width, img_height))
-    # Convert to array and normalize
-    img_array = np.array(image) / 255.0
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
-
-def predict_fruit_quality(image: Image.Image) -> dict:
-    """Predict fruit quality from an image"""
-    # Preprocess image
-    img_array = preprocess_image(image)
-    
-    # Make prediction
-    predictions = model.predict(img_array, verbose=0)
-    predicted_class = np.argmax(predictions[0])
-    confidence = np.max(predictions[0])
+async def predict_fruit_quality_batch(
+    sources: List[Union[bytes, str]],
+    image_hashes: Optional[List[str]] = None,
+    high_accuracy: bool = False
+) -> list:
+    """
+    Predict fruit quality for several images with a single forward pass.
+    Returns one prediction dict per input, or the exception that input raised.
+    With high_accuracy, every low-confidence image is refined in one more pass.
+    """
+    async with model_registry.use() as active:
+        results = [None] * len(sources)
+        if image_hashes is None:
+            image_hashes = [hash_image(source) for source in sources]
+        keys = [cache_key(image_hash, high_accuracy) for image_hash in image_hashes]
+        
+        # Serve repeated uploads from the cache, only decode the rest
+        misses = []
+        for i, key in enumerate(keys):
+            cached = await prediction_cache.get(key, active.fingerprint)
+            if cached is not None:
+                count_prediction(cached)
+                results[i] = cached
+            else:
+                misses.append(i)
+        
+        # Decode every remaining image in parallel across the decode pool
+        decoded = await asyncio.gather(
+            *(decode_upload(sources[i]) for i in misses),
+            return_exceptions=True
+        )
+        valid = []
+        for i, item in zip(misses, decoded):
+            if isinstance(item, BaseException):
+                results[i] = item
+            else:
+                valid.append((i, item))
+        
+        if valid:
+            # Normalize into one N x H x W x 3 float32 batch and run one forward pass
+            probabilities = await run_inference(classify_pixels, active, [pixels for _, pixels in valid])
+            modes = ["standard"] * len(valid)
+            if high_accuracy:
+                probabilities, modes = await refine_uncertain(active, [pixels for _, pixels in valid], probabilities)
+            for (i, _), row, mode in zip(valid, probabilities, modes):
+                with inference_stage_duration.time(stage="postprocess"):
+                    results[i] = format_prediction(row, active, mode)
+                await prediction_cache.put(keys[i], results[i], active.fingerprint)
+        return results
+
+def format_prediction(probabilities: np.ndarray, active: LoadedModel, mode: str = "standard") -> dict:
+    """Turn one row of model output into the prediction response; `mode` says whether augmentation was used"""
+    label_mapping = active.label_mapping
+    predicted_class = int(np.argmax(probabilities))
+    confidence = np.max(probabilities)
     
     # Get class label
     class_label = label_mapping[predicted_class]
@@ -382,19 +593,27 @@ def predict_fruit_quality(image: Image.Image) -> dict:
     
     # Get all class probabilities
     all_predictions = {}
-    for class_idx, prob in enumerate(predictions[0]):
+    for class_idx, prob in enumerate(probabilities):
         class_name = label_mapping.get(class_idx, f"Class_{class_idx}")
         all_predictions[class_name] = float(prob)
     
-    return {
+    prediction = {
         'class': class_label,
         'confidence': float(confidence),
         'quality_status': quality_info['status'],
         'quality_code': quality_info['code'],
         'description': quality_info['description'],
         'export_suitable': quality_info['export_suitable'],
-        'all_predictions': all_predictions
+        'all_predictions': all_predictions,
+        'model_version': active.version,
+        'inference_mode': mode
     }
+    count_prediction(prediction)
+    return prediction
+
+def count_prediction(prediction: dict):
+    """Count a served prediction by class, whether it came from the model or the cache"""
+    predictions_by_class.inc(class_label=prediction['class'], quality=prediction['quality_code'])
 
 def get_quality_description(class_label: str, confidence: float) -> dict:
     """Generate detailed quality description based on class"""
@@ -435,84 +654,131 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    model_status = "loaded" if model is not None else "not loaded"
-    return {"status": "healthy", "model_status": model_status}
+    # Liveness: the process is serving. Nothing here waits on MongoDB, so a slow
+    # database never fails liveness and restarts a healthy pod
+    active = model_registry.active
+    model_status = "loaded" if active is not None else "not loaded"
+    return {
+        "status": "healthy",
+        "model_status": model_status,
+        "readiness": model_registry.state,
+        "model_version": active.version if active else None,
+        "database": {"pool": mongodb.pool_metrics.snapshot()}
+    }
+
+# Readiness: the model is loaded and warmed up, with the database round trip reported alongside
+@app.get("/health/ready")
+async def readiness_check():
+    database = await mongodb.ping()
+    if model_registry.state != "ready":
+        return JSONResponse(status_code=503, content={"status": model_registry.state, "database": database})
+    return {"status": model_registry.state, "database": database}
 
 @app.get("/api/classes")
 async def get_classes():
-    if not class_indices:
+    if model_registry.active is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
-    return {"classes": list(class_indices.keys())}
+    return {"classes": list(model_registry.active.class_indices.keys())}
 
+# high_accuracy=true opts in to test-time augmentation for low-confidence images;
+# prediction.inference_mode says whether it was used ("standard" or "augmented")
 @app.post("/api/predict")
-async def predict(file: UploadFile = File(...)):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+async def predict(
+    file: UploadFile = File(...),
+    high_accuracy: bool = False,
+    user: Optional[UserPrincipal] = Depends(get_optional_user)
+):
+    require_model()
     
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    try:
-        # Read image file
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
-        
-        # Make prediction
-        prediction = predict_fruit_quality(image)
-        
-        # Generate unique prediction ID
-        prediction_id = str(uuid.uuid4())
-        
-        return {
-            "prediction_id": prediction_id,
-            "timestamp": datetime.now().isoformat(),
-            "filename": file.filename,
-            "prediction": prediction
-        }
-        
-    except Exception as e:
-        logger.error(f"Error processing image: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    # Reject early with 503 + Retry-After if inference is saturated
+    async with inference_slot():
+        # Stream the upload into a bounded spool; oversized files and
+        # decompression bombs are rejected with 413 before any decoding
+        async with spool_upload(file) as upload:
+            try:
+                # Make prediction
+                prediction = await predict_fruit_quality(upload.source(), upload.sha256, high_accuracy)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing image: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+            image_hash = upload.sha256
+    
+    # Generate unique prediction ID
+    prediction_id = str(uuid.uuid4())
+    
+    # Persist for the audit trail; buffered, so this never waits on MongoDB
+    prediction_writer.record(prediction_record(
+        prediction, prediction_id, file.filename, image_hash, user.id if user else None, "predict"
+    ))
+    
+    return {
+        "prediction_id": prediction_id,
+        "timestamp": datetime.now().isoformat(),
+        "filename": file.filename,
+        "prediction": prediction
+    }
 
 @app.post("/api/predict-batch")
-async def predict_batch(files: List[UploadFile] = File(...)):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+async def predict_batch(
+    files: List[UploadFile] = File(...),
+    high_accuracy: bool = False,
+    user: Optional[UserPrincipal] = Depends(get_optional_user)
+):
+    require_model()
     
-    if len(files) > 10:  # Limit batch size
-        raise HTTPException(status_code=400, detail="Maximum 10 files allowed per batch")
+    batch_limit = max_batch_files()
+    if len(files) > batch_limit:  # Limit batch size by memory budget
+        raise HTTPException(status_code=400, detail=f"Maximum {batch_limit} files allowed per batch")
     
-    results = []
-    for file in files:
+    results = [None] * len(files)
+    image_indices = []
+    for i, file in enumerate(files):
         # Validate file type
         if not file.content_type.startswith('image/'):
-            results.append({
+            results[i] = {
                 "filename": file.filename,
                 "error": "File must be an image"
-            })
+            }
             continue
+        image_indices.append(i)
+    
+    async with inference_slot(len(image_indices)), AsyncExitStack() as spools:
+        # Spool each upload with the same size guards as /api/predict;
+        # a rejected file is reported on its own without failing the batch
+        uploads = []
+        spooled_indices = []
+        for i in image_indices:
+            try:
+                uploads.append(await spools.enter_async_context(spool_upload(files[i])))
+                spooled_indices.append(i)
+            except HTTPException as e:
+                results[i] = {
+                    "filename": files[i].filename,
+                    "error": e.detail,
+                    "success": False
+                }
+        image_indices = spooled_indices
+        image_hashes = [upload.sha256 for upload in uploads]
         
         try:
-            # Read image file
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents)).convert('RGB')
-            
-            # Make prediction
-            prediction = predict_fruit_quality(image)
-            
-            results.append({
-                "filename": file.filename,
-                "prediction": prediction,
-                "success": True
-            })
-            
+            # Decode in parallel and classify everything in one forward pass
+            predictions = await predict_fruit_quality_batch(
+                [upload.source() for upload in uploads],
+                image_hashes,
+                high_accuracy
+            )
         except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "error": str(e),
-                "success": False
-            })
+            logger.error(f"Error processing batch: {str(e)}")
+            predictions = [e] * len(image_indices)
+    
+    for i, image_hash, prediction in zip(image_indices, image_hashes, predictions):
+        results[i] = batch_item(files[i].filename, image_hash, prediction, user)
     
     return {
         "batch_id": str(uuid.uuid4()),
@@ -520,19 +786,249 @@ async def predict_batch(files: List[UploadFile] = File(...)):
         "results": results
     }
 
+def batch_item(filename: str, image_hash: Optional[str], prediction, user: Optional[UserPrincipal]) -> dict:
+    """One file's entry in a batch response; successful predictions are recorded for the audit trail"""
+    if isinstance(prediction, BaseException):
+        return {
+            "filename": filename,
+            "error": str(prediction),
+            "success": False
+        }
+    prediction_id = str(uuid.uuid4())
+    prediction_writer.record(prediction_record(
+        prediction, prediction_id, filename, image_hash, user.id if user else None, "batch"
+    ))
+    return {
+        "prediction_id": prediction_id,
+        "filename": filename,
+        "prediction": prediction,
+        "success": True
+    }
+
+def stream_record(kind: str, payload: dict, media_type: str) -> str:
+    """One NDJSON line, or one SSE event named after the record type"""
+    data = json.dumps({"type": kind, **payload}, default=str)
+    if media_type == "text/event-stream":
+        return f"event: {kind}\ndata: {data}\n\n"
+    return data + "\n"
+
+# Streaming variant of /api/predict-batch: each file's result is sent as soon
+# as it is classified, followed by a summary record. Every file goes through
+# the shared micro-batcher, so files that finish decoding together share a
+# forward pass and fast images aren't held back by slow ones. Results arrive
+# in completion order and carry the file's `index` in the upload.
+# NDJSON by default; SSE with ?format=sse or Accept: text/event-stream.
+@app.post("/api/predict-batch/stream")
+async def predict_batch_stream(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    format: Optional[str] = None,
+    high_accuracy: bool = False,
+    user: Optional[UserPrincipal] = Depends(get_optional_user)
+):
+    require_model()
+    
+    batch_limit = max_batch_files()
+    if len(files) > batch_limit:  # Limit batch size by memory budget
+        raise HTTPException(status_code=400, detail=f"Maximum {batch_limit} files allowed per batch")
+    if format not in (None, "ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or sse")
+    if format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", "")):
+        media_type = "text/event-stream"
+    else:
+        media_type = "application/x-ndjson"
+    
+    # Admit the batch's images before the response starts, so a saturated pipeline
+    # is still a plain 503; the slot is released once the stream ends or the client goes away
+    images = sum(1 for file in files if file.content_type.startswith('image/'))
+    admission = AsyncExitStack()
+    await admission.enter_async_context(inference_slot(images))
+    batch_id = str(uuid.uuid4())
+    
+    async def grade(i: int, file: UploadFile) -> dict:
+        if not file.content_type.startswith('image/'):
+            return {"index": i, "filename": file.filename, "error": "File must be an image", "success": False}
+        try:
+            # Same size guards as /api/predict; each spool is released as soon as its file is done
+            async with spool_upload(file) as upload:
+                prediction = await predict_fruit_quality(upload.source(), upload.sha256, high_accuracy)
+                image_hash = upload.sha256
+        except HTTPException as e:
+            return {"index": i, "filename": file.filename, "error": e.detail, "success": False}
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}")
+            prediction, image_hash = e, None
+        return {"index": i, **batch_item(file.filename, image_hash, prediction, user)}
+    
+    async def records():
+        start = time.perf_counter()
+        succeeded = 0
+        tasks = [asyncio.ensure_future(grade(i, file)) for i, file in enumerate(files)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                succeeded += item["success"]
+                yield stream_record("result", item, media_type)
+            yield stream_record("summary", {
+                "batch_id": batch_id,
+                "timestamp": datetime.now().isoformat(),
+                "total": len(files),
+                "succeeded": succeeded,
+                "failed": len(files) - succeeded,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            }, media_type)
+        finally:
+            # The client disconnected: stop grading files nobody will read
+            for task in tasks:
+                task.cancel()
+            await admission.aclose()
+    
+    return StreamingResponse(
+        records(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Batch-Id": batch_id},
+        background=BackgroundTask(admission.aclose)
+    )
+
+async def grade_frame(stream: FrameStream, sequence: int, frame: bytes, received_at: float) -> Optional[dict]:
+    """The message for one camera frame, or None if it was shed because the pipeline is full"""
+    if len(frame) > MAX_UPLOAD_BYTES:
+        return {"type": "error", "frame": sequence, "detail": f"Frame exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB upload limit"}
+    try:
+        check_image(io.BytesIO(frame))
+    except HTTPException as e:
+        return {"type": "error", "frame": sequence, "detail": e.detail}
+    
+    # A live feed has no use for a late answer, so skip the frame rather than wait for room
+    if pending_images() >= MAX_PENDING_IMAGES:
+        stream.drop()
+        return None
+    try:
+        async with inference_slot():
+            prediction = await predict_fruit_quality(frame, use_cache=False)
+    except Exception as e:
+        logger.error(f"Error processing frame: {str(e)}")
+        return {"type": "error", "frame": sequence, "detail": f"Error processing frame: {str(e)}"}
+    
+    stream.completed()
+    return {
+        "type": "prediction",
+        "frame": sequence,
+        "class": prediction["class"],
+        "confidence": prediction["confidence"],
+        "quality_code": prediction["quality_code"],
+        "quality_status": prediction["quality_status"],
+        "export_suitable": prediction["export_suitable"],
+        "latency_ms": round((time.monotonic() - received_at) * 1000, 2),
+        "fps": round(stream.fps(), 2),
+        "dropped": stream.stale + stream.rate_limited
+    }
+
+# Live grading for a camera over a conveyor: send JPEG frames as binary
+# messages, get one JSON message back per graded frame. Frames from every
+# connection share the micro-batcher with /api/predict. When inference falls
+# behind, only the newest waiting frame is graded and older ones are dropped;
+# max_fps (capped at WS_MAX_FPS) drops frames sent faster than that on receipt.
+# Send the text message "stats" for this connection's counters and achieved FPS.
+# Frames aren't recorded in prediction history.
+@app.websocket("/api/ws/grade")
+async def grade_stream(websocket: WebSocket, max_fps: float = WS_MAX_FPS):
+    await websocket.accept()
+    if model_registry.state != "ready":
+        await websocket.close(code=1013, reason="Model not loaded")
+        return
+    if stream_stats.open >= WS_MAX_CONNECTIONS:
+        await websocket.close(code=1013, reason="Too many streams")
+        return
+    
+    stream = FrameStream(max_fps)
+    stream_stats.open += 1
+    stream_stats.opened += 1
+    
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    stream.offer(message["bytes"])
+                elif message.get("text") == "stats":
+                    await websocket.send_json({"type": "stats", **stream.stats()})
+        finally:
+            stream.close()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            latest = await stream.next()
+            if latest is None:
+                break
+            result = await grade_frame(stream, *latest)
+            if result is not None:
+                await websocket.send_json(result)
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while a result was being sent
+        pass
+    finally:
+        receiver.cancel()
+        stream_stats.open -= 1
+
+@app.get("/api/inference/stats")
+async def inference_stats():
+    return {
+        "cache": prediction_cache.stats(),
+        "pending_images": pending_images(),
+        "uploads": upload_stats.snapshot(),
+        "prediction_writer": prediction_writer.stats(),
+        "jobs": job_runner.stats(),
+        "streams": stream_stats.snapshot()
+    }
+
+def runtime_gauges():
+    """Point-in-time values from the in-process stats, read when /metrics is scraped"""
+    cache = prediction_cache.stats()
+    uploads = upload_stats.snapshot()
+    writer = prediction_writer.stats()
+    pool = mongodb.pool_metrics.snapshot()
+    return [
+        ("gradefresh_model_ready", "1 when the model is loaded and warmed up", {}, int(model_registry.state == "ready")),
+        ("gradefresh_pending_images", "Images admitted to the inference pipeline", {}, pending_images()),
+        ("gradefresh_prediction_cache_lookups", "Prediction cache lookups by result", {"result": "hit"}, cache["hits"]),
+        ("gradefresh_prediction_cache_lookups", "Prediction cache lookups by result", {"result": "mongo_hit"}, cache["mongo_hits"]),
+        ("gradefresh_prediction_cache_lookups", "Prediction cache lookups by result", {"result": "miss"}, cache["misses"]),
+        ("gradefresh_upload_bytes_in_memory", "Upload bytes currently held in memory", {}, uploads["bytes_in_memory"]),
+        ("gradefresh_upload_peak_bytes_in_memory", "Most upload bytes held in memory at once", {}, uploads["peak_bytes_in_memory"]),
+        ("gradefresh_process_peak_rss_bytes", "Peak resident set size of this worker", {}, uploads["process_peak_rss_bytes"]),
+        ("gradefresh_prediction_writer_buffered", "Predictions waiting to be written to MongoDB", {}, writer["buffered"]),
+        ("gradefresh_prediction_writer_dropped", "Predictions dropped because the write buffer was full", {}, writer["dropped"]),
+        ("gradefresh_websocket_streams", "Open camera grading streams", {}, stream_stats.open),
+        ("gradefresh_mongo_pool_connections", "MongoDB pool connections by state", {"state": "open"}, pool["open"]),
+        ("gradefresh_mongo_pool_connections", "MongoDB pool connections by state", {"state": "in_use"}, pool["in_use"]),
+        ("gradefresh_mongo_pool_connections", "MongoDB pool connections by state", {"state": "waiting"}, pool["waiting"]),
+    ]
+
+METRICS_REGISTRY.register_collector(runtime_gauges)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=METRICS_REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/model-info")
 async def model_info():
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    require_model()
+    active = model_registry.active
     
     return {
-        "input_shape": model.input_shape,
-        "output_shape": model.output_shape,
-        "layers": len(model.layers),
-        "classes": list(class_indices.keys()),
-        "class_count": len(class_indices)
+        **active.backend.describe(),
+        "backend": active.backend.name,
+        "precision": active.backend.precision,
+        "model_version": active.version,
+        "classes": list(active.class_indices.keys()),
+        "class_count": len(active.class_indices)
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Single process by default; pass --workers N to share one model across N workers
+    from app.launcher import main
+    main()
\ No newline at end of file
@@ -22,4 +22,22 @@ class User(BaseModel):
         arbitrary_types_allowed=True,
         json_encoders={ObjectId: str},
         populate_by_name=True
-    )
\ No newline at end of file
+    )
+
+class UserPrincipal(BaseModel):
+    """The authenticated user as seen by request handlers: no password hash, no timestamps"""
+    id: str
+    name: str
+    email: str
+    role: str
+    username: str
+
+    @classmethod
+    def from_document(cls, user: dict) -> "UserPrincipal":
+        return cls(
+            id=str(user["_id"]),
+            name=user.get("name", ""),
+            email=user.get("email", ""),
+            role=user.get("role", ""),
+            username=user.get("username", ""),
+        )
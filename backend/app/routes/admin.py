@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Form
-from datetime import timedelta
+from fastapi import APIRouter, HTTPException, Depends, status, Form, Query, Response
+from datetime import timedelta, datetime
 from app.database.mongodb import get_database
-from app.utils.security import verify_password, create_access_token, get_current_user
-from app.models.user import User
+from app.database.stats import admin_stats
+from app.utils.security import verify_and_update_password, create_access_token, token_claims, get_current_user
+from app.utils.rate_limit import login_limiter
+from app.models.user import UserPrincipal
+from app.utils.principal_cache import principal_cache
+from app.utils.pagination import MAX_PAGE_SIZE, page, parse_cursor
+from app.inference.registry import model_registry
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
+import re
 
 router = APIRouter(tags=["Admin"])
 
@@ -17,14 +23,29 @@ async def admin_login(email: str = Form(...), password: str = Form(...)):
     db = get_database()
     users_collection = db["users"]
     
+    # Refuse locked-out accounts before spending any bcrypt time
+    login_limiter.check(email)
+    
     # Find user by email
     user = await users_collection.find_one({"email": email})
-    if not user or not verify_password(password, user["password"]):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_and_update_password(password, user["password"])
+    if not verified:
+        login_limiter.record_failure(email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_limiter.reset(email)
+    
+    # Upgrade hashes made with an older BCRYPT_ROUNDS
+    if new_hash:
+        await users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password": new_hash, "updated_at": datetime.utcnow()}}
+        )
     
     # Check if user is admin
     if user["role"] != "admin":
@@ -36,7 +57,7 @@ async def admin_login(email: str = Form(...), password: str = Form(...)):
     # Create access token
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": str(user["_id"])}, 
+        data=token_claims(user), 
         expires_delta=access_token_expires
     )
     
@@ -55,37 +76,60 @@ async def admin_login(email: str = Form(...), password: str = Form(...)):
     
     return response_data
 
-# Admin authorization check
-async def verify_admin(current_user: User = Depends(get_current_user)):
+# Admin authorization check. The token's role claim (or the principal cache)
+# turns away non-admins without a lookup, but the admin role itself is re-read
+# from the database on every admin request: a delete or demotion handled by
+# another worker never reaches this worker's principal cache, and the claim
+# would otherwise stay trusted until the token expires.
+async def verify_admin(current_user: UserPrincipal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
+    user = await get_database()["users"].find_one({"_id": ObjectId(current_user.id)}, {"role": 1})
+    if user is None or user.get("role") != "admin":
+        principal_cache.invalidate(current_user.id)
+        raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-# Admin dashboard statistics - FIXED role names
+# Admin dashboard statistics - one aggregation by role, cached for a few seconds
 @router.get("/admin/stats")
-async def get_admin_stats(admin: User = Depends(verify_admin)):
+async def get_admin_stats(admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
-    users_collection = db["users"]
-    
-    stats = {
-        "total_users": await users_collection.count_documents({}),
-        "exporters": await users_collection.count_documents({"role": "exporter"}),
-        "importers": await users_collection.count_documents({"role": "importer"}),
-        "inspectors": await users_collection.count_documents({"role": "inspector"}),
-        "admins": await users_collection.count_documents({"role": "admin"}),
-    }
-    return stats
+    return await admin_stats.get(db)
+
+# Fields returned by the admin user list; password hashes never leave the database
+USER_LIST_PROJECTION = {"name": 1, "email": 1, "phone": 1, "role": 1, "username": 1, "created_at": 1}
 
-# Get all users EXCEPT admins (admin only)
+# Get all users EXCEPT admins (admin only), one page at a time.
+# The next page's cursor is returned in the X-Next-Cursor header.
 @router.get("/admin/users")
-async def get_all_users(admin: User = Depends(verify_admin)):
+async def get_all_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    search: Optional[str] = Query(None, description="prefix of the user's name or email"),
+    admin: UserPrincipal = Depends(verify_admin)
+):
     db = get_database()
     users_collection = db["users"]
     
-    # Get all users EXCEPT admins
-    users = await users_collection.find({"role": {"$ne": "admin"}}).to_list(100)
+    # Admins are never listed, so filtering on them matches nothing
+    if role == "admin":
+        return []
+    query = {"role": role if role else {"$ne": "admin"}}
+    cursor_id = parse_cursor(after)
+    if cursor_id is not None:
+        query["_id"] = {"$gt": cursor_id}
+    if search:
+        prefix = {"$regex": f"^{re.escape(search)}", "$options": "i"}
+        query["$or"] = [{"name": prefix}, {"email": prefix}]
+    
+    # Keyset pagination on _id (creation order); one extra document tells us if there's a next page
+    users = await users_collection.find(query, USER_LIST_PROJECTION) \
+        .sort("_id", 1).limit(limit + 1).to_list(limit + 1)
+    users = page(users, limit, response)
     
-    # Remove passwords from response and format properly
+    # Format for the response
     formatted_users = []
     for user in users:
         formatted_user = {
@@ -103,7 +147,7 @@ async def get_all_users(admin: User = Depends(verify_admin)):
 
 # Delete user endpoint (admin only) - CANNOT delete other admins
 @router.delete("/admin/users/{user_id}")
-async def delete_user(user_id: str, admin: User = Depends(verify_admin)):
+async def delete_user(user_id: str, admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     users_collection = db["users"]
     
@@ -132,6 +176,10 @@ async def delete_user(user_id: str, admin: User = Depends(verify_admin)):
                 detail="User not found"
             )
         
+        # Outstanding tokens for this user must go back to the database
+        principal_cache.invalidate(user_id)
+        await admin_stats.user_removed(db, user.get("role"))
+        
         return {"message": "User deleted successfully"}
     
     except HTTPException:
@@ -140,4 +188,33 @@ async def delete_user(user_id: str, admin: User = Depends(verify_admin)):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting user: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# List model versions in the registry (admin only)
+@router.get("/admin/models")
+async def list_models(admin: UserPrincipal = Depends(verify_admin)):
+    active = model_registry.active
+    return {
+        "active": active.info() if active else None,
+        "state": model_registry.state,
+        "versions": model_registry.versions()
+    }
+
+# Load, warm up and swap in a model version without a restart (admin only)
+@router.post("/admin/models/{version}/activate")
+async def activate_model(version: str, admin: UserPrincipal = Depends(verify_admin)):
+    try:
+        loaded = await model_registry.activate(version)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model version {version} not found"
+        )
+    except Exception as e:
+        # The previous version keeps serving if the new one fails to load
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error activating model version {version}: {str(e)}"
+        )
+    
+    return {"message": f"Model version {version} activated", "model": loaded.info()}
\ No newline at end of file
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Body
 from fastapi.encoders import jsonable_encoder
 from app.database.mongodb import get_database
+from app.database.stats import admin_stats
 from app.models.user import User, PyObjectId
 from app.schemas.user import UserCreate, UserResponse, LoginRequest
-from app.utils.security import get_password_hash, verify_password, create_access_token
+from app.utils.security import get_password_hash_async, verify_and_update_password, create_access_token, token_claims
+from app.utils.rate_limit import login_limiter
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import timedelta, datetime
 import os
 
@@ -28,8 +31,8 @@ async def register(user: UserCreate):
             detail="Username already taken"
         )
     
-    # Hash password
-    hashed_password = get_password_hash(user.password)
+    # Hash password off the event loop
+    hashed_password = await get_password_hash_async(user.password)
     
     # Create user document with timestamps
     user_dict = user.dict()
@@ -38,8 +41,16 @@ async def register(user: UserCreate):
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
     
-    # Insert user
-    result = await users_collection.insert_one(user_dict)
+    # Insert user; the unique indexes catch a concurrent registration with the same email or username
+    try:
+        result = await users_collection.insert_one(user_dict)
+    except DuplicateKeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken" if "username" in str(e) else "Email already registered"
+        )
+    
+    await admin_stats.user_added(db, user.role)
     
     # Get the created user
     created_user = await users_collection.find_one({"_id": result.inserted_id})
@@ -47,7 +58,7 @@ async def register(user: UserCreate):
     # Create access token
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": str(created_user["_id"])}, 
+        data=token_claims(created_user), 
         expires_delta=access_token_expires
     )
     
@@ -71,19 +82,34 @@ async def login(login_data: LoginRequest = Body(...)):
     db = get_database()
     users_collection = db["users"]
     
+    # Refuse locked-out accounts before spending any bcrypt time
+    login_limiter.check(login_data.email)
+    
     # Find user
     user = await users_collection.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password"]):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_and_update_password(login_data.password, user["password"])
+    if not verified:
+        login_limiter.record_failure(login_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_limiter.reset(login_data.email)
+    
+    # Upgrade hashes made with an older BCRYPT_ROUNDS
+    if new_hash:
+        await users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password": new_hash, "updated_at": datetime.utcnow()}}
+        )
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": str(user["_id"])}, 
+        data=token_claims(user), 
         expires_delta=access_token_expires
     )
     
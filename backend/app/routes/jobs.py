@@ -0,0 +1,173 @@
+from fastapi import APIRouter, HTTPException, Depends, status, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import csv
+import io
+import os
+import shutil
+import tarfile
+import uuid
+
+from app.database.mongodb import get_database
+from app.inference.jobs import (
+    ARCHIVE_CHUNK_BYTES, JOB_RESULTS_COLLECTION, JOBS_COLLECTION, JOBS_DIR, MAX_JOB_ARCHIVE_BYTES, MAX_JOB_ARCHIVE_MB,
+    archive_format, count_images, job_runner, job_summary
+)
+from app.models.user import UserPrincipal
+from app.utils.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.utils.security import get_optional_user
+
+router = APIRouter(tags=["Jobs"])
+
+CSV_COLUMNS = [
+    "index", "filename", "success", "class", "confidence", "quality_status",
+    "quality_code", "export_suitable", "prediction_id", "error"
+]
+
+
+def _too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Archive exceeds the {MAX_JOB_ARCHIVE_MB}MB limit"
+    )
+
+
+async def _save_archive(upload: UploadFile, path: str):
+    """Copy an uploaded archive to the job directory chunk by chunk, stopping at the size limit"""
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(ARCHIVE_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_JOB_ARCHIVE_BYTES:
+                raise _too_large()
+            await asyncio.to_thread(f.write, chunk)
+
+
+def _write_tar(path: str, files: List[UploadFile]):
+    """Pack individually uploaded images into an uncompressed tar, so both kinds of job read the same way"""
+    size = 0
+    with tarfile.open(path, "w") as archive:
+        for i, upload in enumerate(files):
+            upload.file.seek(0, os.SEEK_END)
+            info = tarfile.TarInfo(name=os.path.basename(upload.filename or "") or f"image-{i}")
+            info.size = upload.file.tell()
+            size += info.size
+            if size > MAX_JOB_ARCHIVE_BYTES:
+                raise _too_large()
+            upload.file.seek(0)
+            archive.addfile(info, upload.file)
+
+
+async def _get_job(job_id: str, user: Optional[UserPrincipal]) -> dict:
+    job = await get_database()[JOBS_COLLECTION].find_one({"_id": job_id})
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    # Jobs submitted while signed in are private to their owner (and admins)
+    owner = job.get("user_id")
+    if owner and (user is None or (user.id != owner and user.role != "admin")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to view this job")
+    return job
+
+# Submit a bulk grading job: either one zip/tar(.gz/.bz2/.xz) archive or
+# several image files in a multipart upload. Returns 202 with the job id at
+# once; grading runs in the background.
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    archive: Optional[UploadFile] = File(None),
+    files: List[UploadFile] = File([]),
+    user: Optional[UserPrincipal] = Depends(get_optional_user)
+):
+    if (archive is None) == (not files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send either an archive or a list of image files"
+        )
+
+    job_id = str(uuid.uuid4())
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    try:
+        if archive is not None:
+            archive_path = os.path.join(job_dir, "archive")
+            await _save_archive(archive, archive_path)
+            fmt = await asyncio.to_thread(archive_format, archive_path)
+            if fmt is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archive must be a zip or tar file")
+            total = await asyncio.to_thread(count_images, archive_path)
+            filename, source = archive.filename, "archive"
+        else:
+            for file in files:
+                if not (file.content_type or "").startswith('image/'):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"{file.filename}: File must be an image"
+                    )
+            archive_path = os.path.join(job_dir, "archive.tar")
+            await asyncio.to_thread(_write_tar, archive_path, files)
+            fmt, total, filename, source = "tar", len(files), None, "files"
+
+        job = await job_runner.submit(job_id, archive_path, fmt, filename, total, user.id if user else None, source)
+    except BaseException:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    return job_summary(job)
+
+# Progress of a job: processed / succeeded / failed counts and status.
+# total is known up front for zips and uploaded files, and for tars once finished.
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: Optional[UserPrincipal] = Depends(get_optional_user)):
+    return job_summary(await _get_job(job_id, user))
+
+# Graded results in archive order, one page at a time; pass the X-Next-Cursor
+# header of one page as `after` to get the next. Available while the job runs.
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, ge=0),
+    user: Optional[UserPrincipal] = Depends(get_optional_user)
+):
+    await _get_job(job_id, user)
+
+    query = {"job_id": job_id}
+    if after is not None:
+        query["index"] = {"$gt": after}
+    results = await get_database()[JOB_RESULTS_COLLECTION].find(query, {"_id": 0, "job_id": 0}) \
+        .sort("index", 1).limit(limit + 1).to_list(limit + 1)
+
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(results[-1]["index"])
+    return results
+
+# Every result as CSV, streamed from the database so large jobs never sit in memory
+@router.get("/jobs/{job_id}/results.csv")
+async def download_job_results(job_id: str, user: Optional[UserPrincipal] = Depends(get_optional_user)):
+    await _get_job(job_id, user)
+    cursor = get_database()[JOB_RESULTS_COLLECTION].find({"job_id": job_id}, {"_id": 0}) \
+        .sort("index", 1).batch_size(500)
+
+    async def rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        async for result in cursor:
+            prediction = result.get("prediction") or {}
+            writer.writerow({**result, **prediction})
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="job-{job_id}.csv"'}
+    )
@@ -1,18 +1,84 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from pydantic import TypeAdapter
 from bson import ObjectId
-from datetime import datetime
-from typing import List
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+import hashlib
+import os
+import time
 
 from app.database.mongodb import get_database
 from app.models.news import News, NewsCreate, NewsUpdate
-from app.models.user import User
+from app.models.user import UserPrincipal
 from app.routes.admin import verify_admin
+from app.utils.pagination import NEXT_CURSOR_HEADER, parse_cursor, split_page
 
 router = APIRouter(tags=["News"])
 
+# Upper bound on how stale another worker's cached feed can be after an edit
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", 30))
+NEWS_CACHE_MAX_PAGES = 64
+
+_news_list = TypeAdapter(List[News])
+
+
+class PublicNewsCache:
+    """
+    Serialized /news responses keyed by page, with their validators. Edits
+    in this process clear it immediately; edits made by other workers show
+    up once NEWS_CACHE_TTL_SECONDS has passed.
+    """
+
+    def __init__(self, ttl_seconds: float = NEWS_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._pages = {}
+        # Deletions don't show up in any remaining updated_at, so track them here
+        self.changed_at: Optional[datetime] = None
+
+    def get(self, key) -> Optional[dict]:
+        entry = self._pages.get(key)
+        if entry is None or entry["expires"] < time.monotonic():
+            return None
+        return entry
+
+    def put(self, key, body: bytes, last_modified: Optional[datetime], next_cursor: Optional[str]) -> dict:
+        if len(self._pages) >= NEWS_CACHE_MAX_PAGES:
+            self._pages.clear()
+        entry = {
+            "body": body,
+            "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            "last_modified": last_modified,
+            "next_cursor": next_cursor,
+            "expires": time.monotonic() + self.ttl_seconds,
+        }
+        self._pages[key] = entry
+        return entry
+
+    def invalidate(self):
+        self._pages.clear()
+        self.changed_at = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+public_news_cache = PublicNewsCache()
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Conditional GET: If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
 # Get all news
 @router.get("/admin/news", response_model=List[News])
-async def get_all_news(admin: User = Depends(verify_admin)):
+async def get_all_news(admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     news_collection = db["news"]
     
@@ -21,7 +87,7 @@ async def get_all_news(admin: User = Depends(verify_admin)):
 
 # Get single news item
 @router.get("/admin/news/{news_id}", response_model=News)
-async def get_news(news_id: str, admin: User = Depends(verify_admin)):
+async def get_news(news_id: str, admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     news_collection = db["news"]
     
@@ -36,7 +102,7 @@ async def get_news(news_id: str, admin: User = Depends(verify_admin)):
 
 # Create news
 @router.post("/admin/news", response_model=News, status_code=status.HTTP_201_CREATED)
-async def create_news(news_data: NewsCreate, admin: User = Depends(verify_admin)):
+async def create_news(news_data: NewsCreate, admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     news_collection = db["news"]
     
@@ -47,13 +113,14 @@ async def create_news(news_data: NewsCreate, admin: User = Depends(verify_admin)
     news_dict["updated_at"] = datetime.utcnow()
     
     result = await news_collection.insert_one(news_dict)
+    public_news_cache.invalidate()
     created_news = await news_collection.find_one({"_id": result.inserted_id})
     
     return created_news
 
 # Update news
 @router.put("/admin/news/{news_id}", response_model=News)
-async def update_news(news_id: str, news_data: NewsUpdate, admin: User = Depends(verify_admin)):
+async def update_news(news_id: str, news_data: NewsUpdate, admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     news_collection = db["news"]
     
@@ -73,13 +140,14 @@ async def update_news(news_id: str, news_data: NewsUpdate, admin: User = Depends
         {"_id": ObjectId(news_id)},
         {"$set": update_data}
     )
+    public_news_cache.invalidate()
     
     updated_news = await news_collection.find_one({"_id": ObjectId(news_id)})
     return updated_news
 
 # Delete news
 @router.delete("/admin/news/{news_id}")
-async def delete_news(news_id: str, admin: User = Depends(verify_admin)):
+async def delete_news(news_id: str, admin: UserPrincipal = Depends(verify_admin)):
     db = get_database()
     news_collection = db["news"]
     
@@ -90,14 +158,62 @@ async def delete_news(news_id: str, admin: User = Depends(verify_admin)):
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="News not found")
+    public_news_cache.invalidate()
     
     return {"message": "News deleted successfully"}
 
-# Public endpoint to get published news
+# Public endpoint to get published news, newest first.
+# Served from an in-process cache with ETag / Last-Modified so repeat visits get a 304;
+# pass `after` (the X-Next-Cursor header of the previous page) for older items.
 @router.get("/news", response_model=List[News])
-async def get_public_news():
+async def get_public_news(
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = None
+):
+    key = (limit, after)
+    entry = public_news_cache.get(key)
+    if entry is None:
+        entry = await _load_public_news(limit, after)
+    
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if entry["last_modified"] is not None:
+        headers["Last-Modified"] = format_datetime(entry["last_modified"], usegmt=True)
+    if entry["next_cursor"]:
+        headers[NEXT_CURSOR_HEADER] = entry["next_cursor"]
+    
+    if _not_modified(request, entry["etag"], entry["last_modified"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+async def _load_public_news(limit: int, after: Optional[str]) -> dict:
     db = get_database()
     news_collection = db["news"]
     
-    news = await news_collection.find({"is_published": True}).sort("created_at", -1).to_list(50)
-    return news
\ No newline at end of file
+    query = {"is_published": True}
+    cursor_id = parse_cursor(after)
+    if cursor_id is not None:
+        # Keyset on (created_at, _id): continue strictly after the cursor's item
+        anchor = await news_collection.find_one({"_id": cursor_id}, {"created_at": 1})
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["$or"] = [
+            {"created_at": {"$lt": anchor["created_at"]}},
+            {"created_at": anchor["created_at"], "_id": {"$lt": cursor_id}},
+        ]
+    
+    news = await news_collection.find(query).sort([("created_at", -1), ("_id", -1)]) \
+        .limit(limit + 1).to_list(limit + 1)
+    news, next_cursor = split_page(news, limit)
+    
+    # Same JSON FastAPI would produce from response_model=List[News]
+    body = _news_list.dump_json(_news_list.validate_python(news), by_alias=True)
+    timestamps = [
+        item["updated_at"].replace(tzinfo=timezone.utc, microsecond=0)
+        for item in news if item.get("updated_at")
+    ]
+    if public_news_cache.changed_at is not None:
+        timestamps.append(public_news_cache.changed_at)
+    last_modified = max(timestamps) if timestamps else None
+    
+    return public_news_cache.put((limit, after), body, last_modified, next_cursor)
\ No newline at end of file
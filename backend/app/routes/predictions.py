@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import Optional
+
+from app.database.mongodb import get_database
+from app.database.predictions import PREDICTIONS_COLLECTION
+from app.models.user import UserPrincipal
+from app.utils.pagination import MAX_PAGE_SIZE, page, parse_cursor
+from app.utils.security import get_current_user
+
+router = APIRouter(tags=["Predictions"])
+
+# Prediction history for the signed-in user, newest first, one page at a time.
+# The next page's cursor is returned in the X-Next-Cursor header.
+# Admins may pass user_id to read another account's audit trail.
+@router.get("/predictions")
+async def get_prediction_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    if user_id and user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    db = get_database()
+    predictions_collection = db[PREDICTIONS_COLLECTION]
+
+    query = {"user_id": user_id or current_user.id}
+    cursor_id = parse_cursor(after)
+    if cursor_id is not None:
+        query["_id"] = {"$lt": cursor_id}
+
+    predictions = await predictions_collection.find(query, {"user_id": 0}) \
+        .sort("_id", -1).limit(limit + 1).to_list(limit + 1)
+    predictions = page(predictions, limit, response)
+
+    for prediction in predictions:
+        prediction["id"] = str(prediction.pop("_id"))
+    return predictions
@@ -0,0 +1,33 @@
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, Response, status
+
+# Listing endpoints keep returning a plain JSON list; the cursor for the next page travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+def parse_cursor(after: Optional[str]) -> Optional[ObjectId]:
+    """The _id to continue after, or None for the first page"""
+    if after is None:
+        return None
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return ObjectId(after)
+
+
+def split_page(documents: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Trim a query fetched with limit + 1 back to `limit`, plus the next cursor if there was an extra"""
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, str(documents[-1]["_id"])
+    return documents, None
+
+
+def page(documents: List[dict], limit: int, response: Response) -> List[dict]:
+    """split_page, pointing X-Next-Cursor at the next page when there is one"""
+    documents, next_cursor = split_page(documents, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return documents
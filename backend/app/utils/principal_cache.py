@@ -0,0 +1,71 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.models.user import UserPrincipal
+
+# Principals kept per process, and how long one may be served before re-reading the user
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+# Revocations must outlive every token issued before them
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of UserPrincipal by user id, so authenticated requests
+    don't re-read the user document each time.
+
+    invalidate() also records when a user was revoked (deleted or role
+    changed): role claims in tokens issued before that moment are no longer
+    trusted, and the user is read from the database again. Like the other
+    in-process caches, each worker keeps its own copy.
+    """
+
+    def __init__(self, max_entries: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[UserPrincipal]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: UserPrincipal):
+        self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+        now = time.time()
+        self._revoked[user_id] = now
+        # Drop revocations older than any token that could still be valid
+        cutoff = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for revoked_id in [uid for uid, at in self._revoked.items() if at < cutoff]:
+            del self._revoked[revoked_id]
+
+    def claims_trusted(self, user_id: str, issued_at: Optional[float]) -> bool:
+        """Whether a token's role claim can be used as-is for `user_id`"""
+        revoked_at = self._revoked.get(user_id)
+        if revoked_at is None:
+            return True
+        # iat has one-second resolution, so a token from the same second isn't trusted
+        return issued_at is not None and issued_at > revoked_at
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,82 @@
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException, status
+
+# Failed logins allowed per account inside the window before further attempts get a 429
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", 5))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", 900))
+# Accounts tracked at once; past this the least recently failed account is forgotten
+LOGIN_TRACKED_ACCOUNTS = int(os.getenv("LOGIN_TRACKED_ACCOUNTS", 10000))
+
+
+class FailedLoginLimiter:
+    """
+    Sliding-window count of failed logins per account. Checked before the
+    password is verified, so guessing against one account can't keep the
+    bcrypt threads busy. State is per process; with several workers each
+    one enforces the limit on its own. Accounts are kept in order of their
+    latest failure, so expired ones are pruned from the front and memory stays
+    bounded by max_accounts however many addresses are tried.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LOGIN_MAX_FAILURES,
+        window_seconds: int = LOGIN_FAILURE_WINDOW_SECONDS,
+        max_accounts: int = LOGIN_TRACKED_ACCOUNTS,
+    ):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_accounts = max_accounts
+        self._failures: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _key(account: str) -> str:
+        return account.strip().lower()
+
+    def _recent(self, key: str) -> deque:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        cutoff = time.monotonic() - self.window_seconds
+        while failures and failures[0] <= cutoff:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def check(self, account: str):
+        """Raise 429 with Retry-After while `account` is locked out"""
+        failures = self._recent(self._key(account))
+        if len(failures) >= self.max_failures:
+            retry_after = math.ceil(failures[0] + self.window_seconds - time.monotonic())
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many failed login attempts, please try again later",
+                headers={"Retry-After": str(max(1, retry_after))},
+            )
+
+    def record_failure(self, account: str):
+        key = self._key(account)
+        self._recent(key)
+        self._failures.setdefault(key, deque()).append(time.monotonic())
+        self._failures.move_to_end(key)
+        self._prune()
+
+    def _prune(self):
+        """Drop accounts whose latest failure has left the window, then the least recent past max_accounts"""
+        cutoff = time.monotonic() - self.window_seconds
+        while self._failures:
+            oldest = next(iter(self._failures.values()))
+            if oldest[-1] > cutoff and len(self._failures) <= self.max_accounts:
+                break
+            self._failures.popitem(last=False)
+
+    def reset(self, account: str):
+        self._failures.pop(self._key(account), None)
+
+
+login_limiter = FailedLoginLimiter()
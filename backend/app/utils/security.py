@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
@@ -6,7 +9,8 @@ from fastapi.security import OAuth2PasswordBearer
 import os
 from dotenv import load_dotenv
 from app.database.mongodb import get_database
-from app.models.user import User
+from app.models.user import UserPrincipal
+from app.utils.principal_cache import principal_cache
 from bson import ObjectId
 
 # Load environment variables
@@ -18,9 +22,27 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 # OAuth2PasswordBearer is a dependency that handles token extraction from the request
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
+# Same, for endpoints that also serve anonymous callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login", auto_error=False)
+
+# bcrypt cost factor. Hashes made with a different cost are flagged by
+# needs_update, so they are rehashed the next time the user logs in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads for bcrypt work; bcrypt releases the GIL, so these run alongside the event loop
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", 2))
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="bcrypt"
+)
 
 def verify_password(plain_password, hashed_password):
     """Verifies a plain-text password against a hashed password."""
@@ -30,21 +52,51 @@ def get_password_hash(password):
     """Hashes a password for secure storage."""
     return pwd_context.hash(password)
 
+async def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password on the bcrypt thread pool. Also returns a new hash when
+    the stored one uses an outdated cost factor, otherwise None.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash on the bcrypt thread pool, without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+def token_claims(user: dict) -> dict:
+    """JWT claims for a user document: the id plus what authorization needs without a DB lookup."""
+    return {
+        "sub": str(user["_id"]),
+        "role": user.get("role", ""),
+        "name": user.get("name", ""),
+        "email": user.get("email", ""),
+        "username": user.get("username", ""),
+    }
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Creates a JWT access token with an expiration time."""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPrincipal:
     """
-    Decodes a JWT token, verifies its integrity, and fetches the corresponding
-    user from the database.
+    Decodes a JWT token, verifies its integrity, and resolves the user it
+    belongs to. Tokens carrying role claims are trusted without a database
+    read unless this worker saw the user revoked after the token was issued;
+    otherwise the user is read once and kept in the principal cache. Revocation
+    is per worker, so admin routes re-check the role in the database (see
+    verify_admin).
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,14 +113,43 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         # Raise an exception if the token is invalid or expired
         raise credentials_exception
 
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    if "role" in payload and principal_cache.claims_trusted(user_id, payload.get("iat")):
+        return UserPrincipal(
+            id=user_id,
+            name=payload.get("name", ""),
+            email=payload.get("email", ""),
+            role=payload["role"],
+            username=payload.get("username", ""),
+        )
+
     # Get the database connection
     db = get_database()
     users_collection = db["users"]
     
-    # Find the user in the database by their ID
-    user_data = await users_collection.find_one({"_id": ObjectId(user_id)})
+    # Find the user in the database by their ID, without the password hash
+    user_data = await users_collection.find_one(
+        {"_id": ObjectId(user_id)},
+        {"name": 1, "email": 1, "role": 1, "username": 1}
+    )
     if user_data is None:
         raise credentials_exception
     
-    # Return the user object
-    return User(**user_data)
\ No newline at end of file
+    principal = UserPrincipal.from_document(user_data)
+    principal_cache.put(principal)
+    return principal
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[UserPrincipal]:
+    """
+    The signed-in user for endpoints that also work anonymously. A missing,
+    invalid or expired token means an anonymous caller rather than a 401.
+    """
+    if token is None:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
@@ -0,0 +1,129 @@
+# bench_micro.py
+# In-process microbenchmarks for the hot paths behind the API:
+#   preprocess_image      - decode + resize + normalize of one upload
+#   predict_fruit_quality - decode pool, micro-batcher and model, sequential and concurrent
+#   verify_password       - one bcrypt check at BCRYPT_ROUNDS
+#
+#   python benchmarks/bench_micro.py [--only preprocess,predict,password] [--repeat 20] [--output result.json]
+#
+# predict needs the model file (INFERENCE_BACKEND selects the backend as in the
+# API). Uploads are made unique so the prediction cache never answers.
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import peak_rss_mb, save_results, summarize, synthetic_photo
+
+BENCHMARKS = ("preprocess", "predict", "password")
+
+
+def timed(fn, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_preprocess(repeat: int) -> dict:
+    from app.inference.preprocessing import load_image, preprocess_image
+
+    results = {}
+    for label, size in (("12mp", (4000, 3000)), ("vga", (640, 480))):
+        photo = synthetic_photo(*size)
+        run = lambda: preprocess_image(load_image(io.BytesIO(photo)))
+        run()
+        results[label] = summarize(timed(run, repeat))
+        print(f"preprocess_image {label}: p50 {results[label]['p50_ms']:.1f} ms")
+    return results
+
+
+async def bench_predict(repeat: int, concurrency: int) -> dict:
+    from app.inference.executors import shutdown_executors
+    from app.main import batcher, predict_fruit_quality
+    from app.inference.registry import model_registry
+
+    batcher.start()
+    await model_registry.start()
+    if model_registry.state != "ready":
+        raise RuntimeError(f"Model failed to load: {model_registry.state}")
+
+    photo = synthetic_photo(1600, 1200)
+    counter = 0
+
+    def unique_upload() -> bytes:
+        # Trailing bytes after the JPEG end marker change the hash, not the pixels
+        nonlocal counter
+        counter += 1
+        return photo + counter.to_bytes(8, "big")
+
+    async def one() -> float:
+        start = time.perf_counter()
+        await predict_fruit_quality(unique_upload())
+        return time.perf_counter() - start
+
+    results = {}
+    try:
+        await one()
+        results["sequential"] = summarize([await one() for _ in range(repeat)])
+        print(f"predict_fruit_quality sequential: p50 {results['sequential']['p50_ms']:.1f} ms")
+
+        start = time.perf_counter()
+        latencies = []
+        for _ in range(max(1, repeat // concurrency)):
+            latencies.extend(await asyncio.gather(*(one() for _ in range(concurrency))))
+        results[f"concurrent_{concurrency}"] = summary = summarize(latencies, time.perf_counter() - start)
+        print(f"predict_fruit_quality x{concurrency}: p50 {summary['p50_ms']:.1f} ms, "
+              f"{summary['throughput_rps']:.1f} images/s")
+    finally:
+        await model_registry.stop()
+        await batcher.stop()
+        shutdown_executors()
+    return results
+
+
+def bench_password(repeat: int) -> dict:
+    from app.utils.security import BCRYPT_ROUNDS, get_password_hash, verify_password
+
+    hashed = get_password_hash("benchmark-password")
+    summary = summarize(timed(lambda: verify_password("benchmark-password", hashed), repeat))
+    summary["rounds"] = BCRYPT_ROUNDS
+    print(f"verify_password ({BCRYPT_ROUNDS} rounds): p50 {summary['p50_ms']:.1f} ms")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for GradeFresh hot paths")
+    parser.add_argument("--only", type=lambda s: s.split(","), default=list(BENCHMARKS),
+                        help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16, help="Parallel predict_fruit_quality calls")
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    if "preprocess" in args.only:
+        results["preprocess_image"] = bench_preprocess(args.repeat)
+    if "predict" in args.only:
+        results["predict_fruit_quality"] = asyncio.run(bench_predict(args.repeat, args.concurrency))
+    if "password" in args.only:
+        results["verify_password"] = bench_password(args.repeat)
+    results["peak_rss"] = peak_rss_mb(os.getpid())
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    save_results("micro", results, config, args.output)
+
+
+if __name__ == "__main__":
+    main()
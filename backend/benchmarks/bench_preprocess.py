@@ -0,0 +1,88 @@
+# bench_preprocess.py
+# Compares the original preprocessing path with the draft()/float32 pipeline
+# on 12MP phone-sized JPEGs.
+#
+#   python benchmarks/bench_preprocess.py [--images photo1.jpg photo2.jpg] [--repeat 20] [--output result.json]
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH, decode_image, preprocess_batch
+from benchmarks.common import save_results, synthetic_photo
+
+
+def legacy_preprocess(contents: bytes) -> np.ndarray:
+    """The original path: full-resolution decode, default resize, float64 normalize"""
+    image = Image.open(io.BytesIO(contents)).convert('RGB')
+    image = image.resize((IMG_WIDTH, IMG_HEIGHT))
+    img_array = np.array(image) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def pipeline_preprocess(contents: bytes) -> np.ndarray:
+    return preprocess_batch([decode_image(contents)])
+
+
+def measure(fn, payloads, repeat):
+    # Warm up once so imports and codec setup aren't counted
+    fn(payloads[0])
+    timings = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        for contents in payloads:
+            start = time.perf_counter()
+            fn(contents)
+            timings.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = np.array(timings) * 1000
+    return {
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "peak_python_alloc_mb": peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing micro-benchmark")
+    parser.add_argument("--images", nargs="*", help="JPEG files to use instead of a synthetic 12MP photo")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    if args.images:
+        payloads = [Path(p).read_bytes() for p in args.images]
+    else:
+        payloads = [synthetic_photo()]
+
+    # Both paths should feed the model the same thing, give or take resampling
+    legacy = legacy_preprocess(payloads[0])
+    current = pipeline_preprocess(payloads[0])
+    print(f"Output dtype: legacy={legacy.dtype} pipeline={current.dtype}")
+    print(f"Mean absolute difference: {np.abs(legacy - current).mean():.4f}")
+
+    results = {
+        "legacy": measure(legacy_preprocess, payloads, args.repeat),
+        "pipeline": measure(pipeline_preprocess, payloads, args.repeat),
+    }
+    for name, stats in results.items():
+        print(
+            f"{name:>9}: mean {stats['mean_ms']:.1f} ms, p50 {stats['p50_ms']:.1f} ms, "
+            f"p95 {stats['p95_ms']:.1f} ms, peak alloc {stats['peak_python_alloc_mb']:.1f} MB"
+        )
+    speedup = results["legacy"]["mean_ms"] / results["pipeline"]["mean_ms"]
+    print(f"Speedup: {speedup:.1f}x")
+    save_results("preprocess", results, {"images": args.images or ["synthetic 12MP"], "repeat": args.repeat}, args.output)
+
+
+if __name__ == "__main__":
+    main()
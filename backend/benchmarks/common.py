@@ -0,0 +1,121 @@
+# common.py
+# Shared helpers for the benchmark scripts: latency summaries, peak RSS from
+# /proc, synthetic images and JSON result files named after the current commit
+# so runs can be compared with compare.py.
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def summarize(latencies_s: List[float], elapsed_s: Optional[float] = None) -> dict:
+    """p50/p95/p99 in ms, plus throughput when the wall-clock time is known"""
+    if not latencies_s:
+        return {"count": 0}
+    timings = np.array(latencies_s) * 1000
+    summary = {
+        "count": len(timings),
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "max_ms": float(timings.max()),
+    }
+    if elapsed_s:
+        summary["throughput_rps"] = len(timings) / elapsed_s
+    return summary
+
+
+def _proc_status_kb(pid: int, field: str) -> int:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def process_tree(pid: int) -> List[int]:
+    """`pid` and all of its descendants (Linux only)"""
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children = (task / "children").read_text().split()
+        except OSError:
+            continue
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> dict:
+    """
+    Peak resident memory (VmHWM) of a process and its descendants: uvicorn
+    workers, the inference server and decode pool processes. The total is an
+    upper bound since shared pages are counted once per process.
+    """
+    pid = pid or os.getpid()
+    per_process = {p: _proc_status_kb(p, "VmHWM") / 1024 for p in process_tree(pid)}
+    return {
+        "total_mb": sum(per_process.values()),
+        "max_process_mb": max(per_process.values()) if per_process else 0.0,
+        "processes": len(per_process),
+    }
+
+
+def synthetic_photo(width: int = 4000, height: int = 3000, seed: int = 0) -> bytes:
+    """A JPEG with enough texture that the encoder can't cheat; a new seed gives a new image hash"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = gradient
+    pixels[..., 1] = gradient[::-1]
+    pixels[..., 2] = rng.integers(0, 255, (height, width), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, results: dict, config: dict, output: Optional[Path] = None) -> Path:
+    """Write results with enough context to compare runs: commit, time, host and settings"""
+    commit = git_commit()
+    document = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{name}-{commit}-{int(time.time())}.json"
+    output.write_text(json.dumps(document, indent=2, default=str))
+    print(f"📄 Results written to {output}")
+    return output
@@ -0,0 +1,70 @@
+# compare.py
+# Compares two result files from the benchmark scripts, usually the same
+# benchmark on two commits, and exits non-zero if anything regressed.
+#
+#   python benchmarks/compare.py baseline.json candidate.json [--threshold 10]
+#
+# Latency (*_ms) and memory (*_mb) regress when they grow; throughput
+# (*_rps) regresses when it shrinks. Other numbers are shown but not judged.
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def direction(metric: str) -> int:
+    """+1 if bigger is worse, -1 if smaller is worse, 0 if not judged"""
+    if metric.endswith("_ms") or metric.endswith("_mb"):
+        return 1
+    if metric.endswith("_rps"):
+        return -1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent (default: 10)")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        print(f"⚠️  Comparing different benchmarks: {baseline.get('benchmark')} vs {candidate.get('benchmark')}")
+    print(f"Baseline {baseline.get('commit')}  →  candidate {candidate.get('commit')}\n")
+
+    before, after = flatten(baseline["results"]), flatten(candidate["results"])
+    regressions = []
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        sign = direction(metric)
+        if sign and change * sign > args.threshold:
+            flag = "  ❌ regression"
+            regressions.append(metric)
+        elif sign and -change * sign > args.threshold:
+            flag = "  ✅ improvement"
+        print(f"{metric:<55} {old:>12.2f} {new:>12.2f} {change:>+8.1f}%{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0f}%")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
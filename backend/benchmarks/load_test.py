@@ -0,0 +1,193 @@
+# load_test.py
+# Drives the main API endpoints at a fixed concurrency and reports latency
+# percentiles, throughput, status codes and the server's peak RSS.
+#
+# Starts its own server through app.launcher (MongoDB from .env must be up for
+# login and news), or targets a running one with --url (RSS is then skipped):
+#
+#   python benchmarks/load_test.py [--workers 2] [--concurrency 16] [--requests 200]
+#   python benchmarks/load_test.py --url http://localhost:8000 --scenarios predict,news
+#
+# Every predict upload is made unique by appending random bytes after the JPEG
+# end marker, so the prediction cache never answers; pass --cache-hits to
+# measure the cached path instead.
+import argparse
+import asyncio
+import os
+import secrets
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import BACKEND_DIR, peak_rss_mb, save_results, summarize, synthetic_photo
+
+SCENARIOS = ("predict", "predict-batch", "login", "news")
+PASSWORD = "load-test-password"
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.launcher", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 180.0):
+    """Poll /health/ready until the model is loaded"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+async def create_account(client: httpx.AsyncClient) -> str:
+    """Register a throwaway user to log in as; returns its email"""
+    suffix = secrets.token_hex(4)
+    email = f"loadtest-{suffix}@example.com"
+    response = await client.post("/api/register", json={
+        "name": "Load Test",
+        "phone": "0000000000",
+        "email": email,
+        "role": "user",
+        "username": f"loadtest-{suffix}",
+        "password": PASSWORD,
+    })
+    response.raise_for_status()
+    return email
+
+
+async def run_scenario(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    concurrency: int,
+    total: int,
+) -> dict:
+    """Send `total` requests from `concurrency` clients, each starting its next request as soon as one returns"""
+    latencies, statuses = [], Counter()
+    next_index = 0
+
+    async def client_loop():
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await send(index)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies, elapsed)
+    summary["statuses"] = dict(statuses)
+    summary["elapsed_s"] = elapsed
+    return summary
+
+
+async def main_async(args) -> dict:
+    server: Optional[subprocess.Popen] = None
+    base_url = args.url
+    if base_url is None:
+        server = start_server(args.port, args.workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    photo = synthetic_photo(*args.image_size)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    def upload(index: int, position: int = 0) -> bytes:
+        if args.cache_hits:
+            return photo
+        # Trailing data after the JPEG EOI marker changes the hash but not the decoded pixels
+        return photo + index.to_bytes(8, "big") + position.to_bytes(2, "big")
+
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client)
+
+            email = None
+            if "login" in args.scenarios:
+                email = await create_account(client)
+
+            senders = {
+                "predict": lambda i: client.post(
+                    "/api/predict", files={"file": (f"{i}.jpg", upload(i), "image/jpeg")}
+                ),
+                "predict-batch": lambda i: client.post("/api/predict-batch", files=[
+                    ("files", (f"{i}-{n}.jpg", upload(i, n), "image/jpeg")) for n in range(args.batch_files)
+                ]),
+                "login": lambda i: client.post("/api/login", json={"email": email, "password": PASSWORD}),
+                "news": lambda i: client.get("/api/news", params={"limit": 20}),
+            }
+
+            for name in args.scenarios:
+                print(f"▶ {name}: {args.requests} requests at concurrency {args.concurrency}")
+                # A short warm-up so connection setup and first-call costs stay out of the numbers
+                await run_scenario(senders[name], args.concurrency, min(args.concurrency, args.requests))
+                results[name] = await run_scenario(senders[name], args.concurrency, args.requests)
+                summary = results[name]
+                print(
+                    f"  p50 {summary['p50_ms']:.1f} ms  p95 {summary['p95_ms']:.1f} ms  "
+                    f"p99 {summary['p99_ms']:.1f} ms  {summary['throughput_rps']:.1f} req/s  "
+                    f"statuses {summary['statuses']}"
+                )
+
+        if server is not None:
+            results["server_peak_rss"] = peak_rss_mb(server.pid)
+            print(f"Server peak RSS: {results['server_peak_rss']['total_mb']:.0f} MB "
+                  f"across {results['server_peak_rss']['processes']} processes")
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the GradeFresh API")
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--batch-files", type=int, default=8, help="Images per /api/predict-batch request")
+    parser.add_argument("--image-size", type=int, nargs=2, default=(1600, 1200), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--cache-hits", action="store_true", help="Upload the same image every time")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(main_async(args))
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    save_results("load", results, config, args.output)
+
+
+if __name__ == "__main__":
+    main()
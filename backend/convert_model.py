@@ -0,0 +1,119 @@
+# convert_model.py
+# Converts models/fruit_quality_cnn_model.h5 into the formats served by the
+# tflite and onnx inference backends, and checks that they agree with Keras.
+#
+#   python convert_model.py                      # write .tflite and .onnx
+#   python convert_model.py --formats tflite     # only one format
+#   python convert_model.py --check-only         # re-run the parity check
+#
+# ONNX export needs tf2onnx and onnxruntime. Checked with
+#   pip install tf2onnx==1.17.0 "onnx<1.17" "onnxruntime<1.20"
+# (newer onnx / onnxruntime wheels pull in numpy 2, which TF 2.16 can't import).
+import argparse
+import pickle
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from app.inference.backends import load_backend, model_file
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH, load_image, preprocess_batch, resize_pixels
+
+MODELS_DIR = Path(__file__).parent / "models"
+
+
+@contextmanager
+def saved_model(keras_model):
+    """
+    Export the model as a SavedModel in a temporary directory. Both converters
+    start from this export: with Keras 3 (installed by TF 2.16) the TFLite
+    converter's from_keras_model aborts the process with an LLVM error, and
+    tf2onnx can't trace a Keras 3 model directly either.
+    """
+    with tempfile.TemporaryDirectory(prefix="gradefresh-export-") as directory:
+        keras_model.export(directory)
+        yield directory
+
+
+def convert_tflite(saved_model_dir: str, output_path: Path):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    output_path.write_bytes(converter.convert())
+    print(f"✅ Wrote {output_path}")
+
+
+def convert_onnx(saved_model_dir: str, output_path: Path):
+    import tensorflow as tf
+    import tf2onnx
+
+    exported = tf.saved_model.load(saved_model_dir)
+    # Keep the batch dimension dynamic so the server can run any batch size
+    signature = [tf.TensorSpec((None, IMG_HEIGHT, IMG_WIDTH, 3), tf.float32, name="input")]
+    serve = tf.function(lambda images: exported.serve(images), input_signature=signature)
+    tf2onnx.convert.from_function(serve, input_signature=signature, opset=13, output_path=str(output_path))
+    print(f"✅ Wrote {output_path}")
+
+
+def sample_batch(image_dir: Path = None, count: int = 16) -> np.ndarray:
+    """Real images from image_dir if given, otherwise random pixels"""
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).rglob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+        pixels = [resize_pixels(load_image(p)) for p in paths[:count]]
+    else:
+        rng = np.random.default_rng(0)
+        pixels = list(rng.integers(0, 256, (count, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.uint8))
+    return preprocess_batch(pixels)
+
+
+def compare_backend(models_dir: Path, name: str, img_batch: np.ndarray, reference: np.ndarray):
+    """Per-class max |Δp| of a converted backend against the Keras reference, and its top-1 agreement"""
+    candidate = load_backend(models_dir, name, "float32").predict(img_batch)
+    per_class = np.abs(candidate - reference).max(axis=0)
+    same_top1 = float((candidate.argmax(axis=1) == reference.argmax(axis=1)).mean())
+    return per_class, same_top1
+
+
+def check_parity(formats, img_batch: np.ndarray, atol: float, models_dir: Path = MODELS_DIR) -> bool:
+    """Compare every class probability from each converted backend with Keras"""
+    with open(models_dir / "label_mapping.pkl", 'rb') as f:
+        label_mapping = pickle.load(f)
+
+    reference = load_backend(models_dir, "keras", "float32").predict(img_batch)
+    ok = True
+    for name in formats:
+        per_class, same_top1 = compare_backend(models_dir, name, img_batch, reference)
+        max_diff = per_class.max()
+        passed = bool(max_diff <= atol)
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {name}: max |Δp| {max_diff:.2e}, top-1 agreement {same_top1:.1%}")
+        for class_idx, class_diff in enumerate(per_class):
+            print(f"    {label_mapping.get(class_idx, f'Class_{class_idx}')}: {class_diff:.2e}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Keras CNN for the tflite / onnx backends")
+    parser.add_argument("--formats", nargs="+", choices=["tflite", "onnx"], default=["tflite", "onnx"])
+    parser.add_argument("--check-only", action="store_true", help="skip conversion, only compare outputs")
+    parser.add_argument("--images", type=Path, help="folder of sample images for the parity check")
+    parser.add_argument("--atol", type=float, default=1e-4, help="allowed absolute difference per probability")
+    args = parser.parse_args()
+
+    if not args.check_only:
+        from tensorflow.keras.models import load_model
+
+        keras_model = load_model(model_file(MODELS_DIR, "keras"))
+        converters = {"tflite": convert_tflite, "onnx": convert_onnx}
+        with saved_model(keras_model) as saved_model_dir:
+            for name in args.formats:
+                converters[name](saved_model_dir, model_file(MODELS_DIR, name))
+
+    if not check_parity(args.formats, sample_batch(args.images), args.atol):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
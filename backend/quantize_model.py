@@ -0,0 +1,162 @@
+# quantize_model.py
+# Post-training int8 quantization of models/fruit_quality_cnn_model.h5.
+# Calibrates on a folder of sample images and writes
+# models/fruit_quality_cnn_model_int8.tflite, which the server uses when
+# started with MODEL_PRECISION=int8.
+#
+#   python quantize_model.py --calibration-dir samples/ [--eval-dir labelled/]
+#
+# The evaluation folder holds one sub-folder per class, named as in
+# label_mapping.pkl (freshapples/, rottenbanana/, ...). Without --eval-dir the
+# comparison runs on the calibration folder when it is laid out the same way.
+# --max-accuracy-drop 0.02 exits non-zero if int8 loses more than 2 points of
+# accuracy on any class.
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.inference.backends import load_backend, model_file
+from convert_model import saved_model
+from app.inference.preprocessing import load_image, preprocess_batch, resize_pixels
+
+MODELS_DIR = Path(__file__).parent / "models"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+def image_paths(folder: Path):
+    return sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def load_pixels(path: Path) -> np.ndarray:
+    return resize_pixels(load_image(path))
+
+
+def quantize(calibration_dir: Path, samples: int, output_path: Path, models_dir: Path = MODELS_DIR):
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(model_file(models_dir, "keras"))
+    paths = image_paths(calibration_dir)[:samples]
+    if not paths:
+        raise SystemExit(f"❌ No images found in {calibration_dir}")
+
+    def representative_dataset():
+        for path in paths:
+            yield [preprocess_batch([load_pixels(path)])]
+
+    # Converted from a SavedModel export; from_keras_model aborts under Keras 3
+    with saved_model(keras_model) as saved_model_dir:
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        # Integer kernels throughout; input and output stay float32 so the server
+        # feeds the quantized model exactly like the float one
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        output_path.write_bytes(converter.convert())
+
+    float_mb = model_file(models_dir, "keras").stat().st_size / (1024 * 1024)
+    int8_mb = output_path.stat().st_size / (1024 * 1024)
+    print(f"✅ Wrote {output_path} ({int8_mb:.1f} MB, float model {float_mb:.1f} MB)")
+    print(f"   Calibrated on {len(paths)} images")
+
+
+def labelled_images(eval_dir: Path, label_mapping: dict):
+    """(path, class_idx) pairs from class-named sub-folders"""
+    class_by_name = {name: idx for idx, name in label_mapping.items()}
+    pairs = []
+    for class_dir in sorted(p for p in Path(eval_dir).iterdir() if p.is_dir()):
+        if class_dir.name in class_by_name:
+            pairs.extend((path, class_by_name[class_dir.name]) for path in image_paths(class_dir))
+    return pairs
+
+
+def evaluate(backend, batches):
+    """Predicted class per image and mean latency per batch in ms"""
+    predicted, timings = [], []
+    for img_batch in batches:
+        start = time.perf_counter()
+        probabilities = backend.predict(img_batch)
+        timings.append((time.perf_counter() - start) * 1000)
+        predicted.extend(np.argmax(probabilities, axis=1))
+    return np.array(predicted), float(np.mean(timings))
+
+
+def compare(eval_dir: Path, batch_size: int, models_dir: Path = MODELS_DIR) -> dict:
+    """Print and return per-class accuracy, {class name: {precision: accuracy}}, for float32 vs int8"""
+    with open(models_dir / "label_mapping.pkl", 'rb') as f:
+        label_mapping = pickle.load(f)
+
+    pairs = labelled_images(eval_dir, label_mapping)
+    if not pairs:
+        print(f"⚠️  No class-named sub-folders in {eval_dir}, skipping accuracy comparison")
+        return {}
+
+    labels = np.array([class_idx for _, class_idx in pairs])
+    pixels = [load_pixels(path) for path, _ in pairs]
+    batches = [preprocess_batch(pixels[i:i + batch_size]) for i in range(0, len(pixels), batch_size)]
+
+    results = {}
+    for precision in ("float32", "int8"):
+        backend = load_backend(models_dir, "keras" if precision == "float32" else "tflite", precision)
+        # One untimed pass so graph tracing / tensor allocation isn't measured
+        backend.predict(batches[0])
+        results[precision] = evaluate(backend, batches)
+
+    per_class = {}
+    print(f"\n{'class':<16}{'images':>8}{'float32':>10}{'int8':>10}")
+    for class_idx, class_name in sorted(label_mapping.items()):
+        mask = labels == class_idx
+        if not mask.any():
+            continue
+        accuracy = {p: float((results[p][0][mask] == class_idx).mean()) for p in results}
+        per_class[class_name] = accuracy
+        print(f"{class_name:<16}{int(mask.sum()):>8}{accuracy['float32']:>10.1%}{accuracy['int8']:>10.1%}")
+
+    overall = {p: (results[p][0] == labels).mean() for p in results}
+    agreement = (results["float32"][0] == results["int8"][0]).mean()
+    print(f"{'overall':<16}{len(labels):>8}{overall['float32']:>10.1%}{overall['int8']:>10.1%}")
+    print(f"\nTop-1 agreement float32 vs int8: {agreement:.1%}")
+    print(
+        f"Mean latency per batch of {batch_size}: "
+        f"float32 {results['float32'][1]:.1f} ms, int8 {results['int8'][1]:.1f} ms"
+    )
+    return per_class
+
+
+def accuracy_drops(per_class: dict) -> dict:
+    """Accuracy lost by int8 on each class (negative when int8 does better)"""
+    return {name: accuracy["float32"] - accuracy["int8"] for name, accuracy in per_class.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post-training int8 quantization of the fruit quality CNN")
+    parser.add_argument("--calibration-dir", type=Path, required=True, help="folder of representative images")
+    parser.add_argument("--samples", type=int, default=200, help="calibration images to use")
+    parser.add_argument("--eval-dir", type=Path, help="labelled folder for the accuracy/latency comparison")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-convert", action="store_true", help="only run the comparison")
+    parser.add_argument(
+        "--max-accuracy-drop", type=float,
+        help="fail if int8 accuracy on any class is lower than float32 by more than this fraction"
+    )
+    args = parser.parse_args()
+
+    if not args.skip_convert:
+        quantize(args.calibration_dir, args.samples, model_file(MODELS_DIR, "tflite", "int8"))
+    per_class = compare(args.eval_dir or args.calibration_dir, args.batch_size)
+
+    if args.max_accuracy_drop is not None:
+        failing = {name: drop for name, drop in accuracy_drops(per_class).items() if drop > args.max_accuracy_drop}
+        for name, drop in failing.items():
+            print(f"❌ {name}: int8 accuracy {drop:.1%} below float32")
+        if failing or not per_class:
+            sys.exit(1)
+        print(f"✅ No class lost more than {args.max_accuracy_drop:.1%} accuracy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Run from backend/ like the server, and give app.utils.security the settings it reads at import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "gradefresh_test")
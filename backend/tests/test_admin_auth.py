@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.models.user import UserPrincipal
+from app.routes import admin
+from app.utils.principal_cache import principal_cache
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return self.users.get(query["_id"])
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = FakeUsers({})
+    monkeypatch.setattr(admin, "get_database", lambda: {"users": collection})
+    return collection
+
+
+def principal(user_id: ObjectId, role: str) -> UserPrincipal:
+    return UserPrincipal(id=str(user_id), name="", email="a@example.com", role=role, username="")
+
+
+def test_admin_still_admin_in_database_is_allowed(users):
+    user_id = ObjectId()
+    users.users[user_id] = {"_id": user_id, "role": "admin"}
+    current = principal(user_id, "admin")
+    assert asyncio.run(admin.verify_admin(current)) is current
+
+
+@pytest.mark.parametrize("stored", [None, {"role": "user"}])
+def test_deleted_or_demoted_admin_is_refused_despite_token_claim(users, stored):
+    user_id = ObjectId()
+    if stored is not None:
+        users.users[user_id] = {"_id": user_id, **stored}
+    principal_cache.put(principal(user_id, "admin"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(admin.verify_admin(principal(user_id, "admin")))
+
+    assert excinfo.value.status_code == 403
+    assert principal_cache.get(str(user_id)) is None
+    assert not principal_cache.claims_trusted(str(user_id), None)
+
+
+def test_non_admin_claim_is_refused_without_a_lookup(users):
+    with pytest.raises(HTTPException):
+        asyncio.run(admin.verify_admin(principal(ObjectId(), "user")))
+    assert users.lookups == 0
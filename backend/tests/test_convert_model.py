@@ -0,0 +1,62 @@
+import pickle
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from app.inference.backends import load_backend, model_file
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH
+from convert_model import compare_backend, convert_onnx, convert_tflite, sample_batch, saved_model
+
+CLASSES = 6
+ATOL = 1e-4
+
+
+def build_fixture_model():
+    """A tiny CNN with the served input shape and confident, seeded outputs"""
+    tf.keras.utils.set_random_seed(0)
+    return tf.keras.Sequential([
+        tf.keras.Input((IMG_HEIGHT, IMG_WIDTH, 3)),
+        tf.keras.layers.Conv2D(4, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(CLASSES, kernel_initializer=tf.keras.initializers.RandomNormal(stddev=5.0)),
+        tf.keras.layers.Softmax(),
+    ])
+
+
+@pytest.fixture(scope="module")
+def models_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("models")
+    model = build_fixture_model()
+    model.save(model_file(directory, "keras"))
+    with open(directory / "label_mapping.pkl", "wb") as f:
+        pickle.dump({i: f"class_{i}" for i in range(CLASSES)}, f)
+    with saved_model(model) as saved_model_dir:
+        convert_tflite(saved_model_dir, model_file(directory, "tflite"))
+        if _onnx_available():
+            convert_onnx(saved_model_dir, model_file(directory, "onnx"))
+    return directory
+
+
+def _onnx_available() -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+        import tf2onnx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize("backend", ["tflite", "onnx"])
+def test_converted_backend_matches_keras(models_dir, backend):
+    if backend == "onnx" and not _onnx_available():
+        pytest.skip("tf2onnx / onnxruntime not installed")
+    img_batch = sample_batch(count=8)
+    reference = load_backend(models_dir, "keras", "float32").predict(img_batch)
+
+    per_class, same_top1 = compare_backend(models_dir, backend, img_batch, reference)
+
+    assert per_class.shape == (CLASSES,)
+    assert per_class.max() <= ATOL
+    assert same_top1 == 1.0
@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.inference import jobs
+from app.inference.jobs import JOB_RESULTS_COLLECTION, JOBS_COLLECTION, JobRunner
+
+
+class FakeJobs:
+    def __init__(self, worker):
+        self.worker = worker
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+        return SimpleNamespace(matched_count=int(query.get("worker") == self.worker))
+
+
+class FakeResults:
+    def __init__(self, stored=()):
+        self.stored = {document["index"]: document for document in stored}
+
+    async def delete_many(self, query):
+        pass
+
+    async def insert_many(self, documents, ordered=True):
+        errors = []
+        for document in documents:
+            if document["index"] in self.stored:
+                errors.append({"code": 11000, "index": document["index"]})
+                if ordered:
+                    break
+            else:
+                self.stored[document["index"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+
+
+def make_runner(results=None):
+    runner = JobRunner()
+    runner._db = {JOBS_COLLECTION: FakeJobs(runner.worker_id), JOB_RESULTS_COLLECTION: results or FakeResults()}
+    return runner
+
+
+def result(index):
+    return {"job_id": "job", "index": index, "success": True}
+
+
+def test_results_already_stored_by_another_claimant_are_skipped():
+    results = FakeResults([result(0)])
+    runner = make_runner(results)
+
+    asyncio.run(runner._save_results([result(0), result(1), result(2)]))
+
+    assert sorted(results.stored) == [0, 1, 2]
+
+
+def test_other_write_errors_are_raised():
+    class BrokenResults(FakeResults):
+        async def insert_many(self, documents, ordered=True):
+            raise BulkWriteError({"writeErrors": [{"code": 121, "index": 0}], "writeConcernErrors": []})
+
+    runner = make_runner(BrokenResults())
+    with pytest.raises(BulkWriteError):
+        asyncio.run(runner._save_results([result(0)]))
+
+
+def test_lease_is_renewed_while_a_batch_waits_for_inference(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0.3)
+    runner = make_runner()
+
+    class Reader:
+        def __init__(self, *args, **kwargs):
+            self.batches = [[jobs.JobEntry(0, "a.jpg", None, None, "unreadable")]]
+
+        def next_batch(self, *args):
+            return self.batches.pop() if self.batches else []
+
+        def close(self):
+            pass
+
+    async def slow_grade(batch, job):
+        await asyncio.sleep(0.5)
+        return [{"index": 0, "success": False}]
+
+    monkeypatch.setattr(jobs, "ArchiveReader", Reader)
+    monkeypatch.setattr(runner, "_grade", slow_grade)
+    job = {"_id": "job", "archive_path": str(tmp_path / "job" / "a.zip"), "format": "zip", "source": "archive", "attempts": 1}
+
+    asyncio.run(runner._process(job))
+
+    updates = runner._db[JOBS_COLLECTION].updates
+    # before the batch, at least once while it was graded, the checkpoint, then completion
+    assert len(updates) >= 4
+    assert updates[-1]["status"] == "completed"
+
+
+def test_job_that_keeps_failing_without_progress_is_given_up(monkeypatch, tmp_path):
+    runner = make_runner()
+    monkeypatch.setattr(jobs, "ArchiveReader", lambda *args, **kwargs: pytest.fail("archive should not be read"))
+    job = {"_id": "job", "archive_path": str(tmp_path / "job" / "a.zip"), "format": "zip", "source": "archive",
+           "attempts": jobs.JOB_MAX_ATTEMPTS + 1}
+
+    asyncio.run(runner._process(job))
+
+    final = runner._db[JOBS_COLLECTION].updates[-1]
+    assert final["status"] == "failed"
+    assert "attempts" in final["error"]
+    assert runner.failed == 1
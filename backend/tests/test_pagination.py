@@ -0,0 +1,43 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from app.utils.pagination import NEXT_CURSOR_HEADER, page, parse_cursor, split_page
+
+DOCUMENTS = sorted(({"_id": ObjectId(), "n": i} for i in range(23)), key=lambda d: d["_id"])
+
+
+def fetch(after, limit):
+    """What the routes ask MongoDB for: _id > cursor, sorted by _id, one extra document"""
+    cursor_id = parse_cursor(after)
+    matching = [d for d in DOCUMENTS if cursor_id is None or d["_id"] > cursor_id]
+    return matching[:limit + 1]
+
+
+@pytest.mark.parametrize("limit", [1, 5, 10, 23, 100])
+def test_cursor_round_trip_visits_every_document_once_in_order(limit):
+    seen, after, pages = [], None, 0
+    while True:
+        response = Response()
+        documents = page(fetch(after, limit), limit, response)
+        assert len(documents) <= limit
+        seen.extend(documents)
+        pages += 1
+        after = response.headers.get(NEXT_CURSOR_HEADER)
+        if after is None:
+            break
+        assert after == str(documents[-1]["_id"])
+    assert seen == DOCUMENTS
+    assert pages == max(1, -(-len(DOCUMENTS) // limit))
+
+
+def test_exact_page_has_no_next_cursor():
+    documents, next_cursor = split_page(DOCUMENTS[:5], 5)
+    assert len(documents) == 5
+    assert next_cursor is None
+
+
+def test_invalid_cursor_is_a_400():
+    with pytest.raises(HTTPException) as excinfo:
+        parse_cursor("not-an-object-id")
+    assert excinfo.value.status_code == 400
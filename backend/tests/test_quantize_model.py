@@ -0,0 +1,63 @@
+import pickle
+
+import numpy as np
+import pytest
+from PIL import Image
+
+tf = pytest.importorskip("tensorflow")
+
+from app.inference.backends import model_file
+from app.inference.preprocessing import IMG_HEIGHT, IMG_WIDTH
+from quantize_model import accuracy_drops, compare, quantize
+
+CLASS_NAMES = ["reds", "greens", "blues"]
+IMAGES_PER_CLASS = 8
+MAX_ACCURACY_DROP = 0.02
+
+
+def build_fixture_model():
+    """Classifies an image by its dominant colour channel, so accuracy is meaningful"""
+    conv = tf.keras.layers.Conv2D(3, 1, activation="relu")
+    dense = tf.keras.layers.Dense(len(CLASS_NAMES))
+    model = tf.keras.Sequential([
+        tf.keras.Input((IMG_HEIGHT, IMG_WIDTH, 3)),
+        conv,
+        tf.keras.layers.GlobalAveragePooling2D(),
+        dense,
+        tf.keras.layers.Softmax(),
+    ])
+    conv.set_weights([np.eye(3, dtype=np.float32).reshape(1, 1, 3, 3), np.zeros(3, np.float32)])
+    dense.set_weights([np.eye(3, dtype=np.float32) * 20, np.zeros(3, np.float32)])
+    return model
+
+
+@pytest.fixture(scope="module")
+def labelled_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("labelled")
+    rng = np.random.default_rng(0)
+    for class_idx, name in enumerate(CLASS_NAMES):
+        (directory / name).mkdir()
+        for i in range(IMAGES_PER_CLASS):
+            pixels = rng.integers(0, 120, (48, 48, 3), dtype=np.uint8)
+            pixels[..., class_idx] = rng.integers(160, 256, (48, 48), dtype=np.uint8)
+            Image.fromarray(pixels).save(directory / name / f"{i}.png")
+    return directory
+
+
+@pytest.fixture(scope="module")
+def models_dir(tmp_path_factory, labelled_dir):
+    directory = tmp_path_factory.mktemp("models")
+    build_fixture_model().save(model_file(directory, "keras"))
+    with open(directory / "label_mapping.pkl", "wb") as f:
+        pickle.dump(dict(enumerate(CLASS_NAMES)), f)
+    quantize(labelled_dir, 100, model_file(directory, "tflite", "int8"), directory)
+    return directory
+
+
+def test_int8_accuracy_per_class_within_budget(models_dir, labelled_dir):
+    per_class = compare(labelled_dir, batch_size=8, models_dir=models_dir)
+
+    assert sorted(per_class) == sorted(CLASS_NAMES)
+    assert all(accuracy["float32"] == 1.0 for accuracy in per_class.values())
+    drops = accuracy_drops(per_class)
+    assert max(drops.values()) <= MAX_ACCURACY_DROP, drops
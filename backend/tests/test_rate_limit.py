@@ -0,0 +1,29 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.rate_limit import FailedLoginLimiter
+
+
+def test_tracked_accounts_are_capped_least_recent_first():
+    limiter = FailedLoginLimiter(max_failures=2, window_seconds=900, max_accounts=100)
+    for i in range(1000):
+        limiter.record_failure(f"user{i}@example.com")
+    assert len(limiter._failures) == 100
+    assert "user0@example.com" not in limiter._failures
+    assert "user999@example.com" in limiter._failures
+
+
+def test_expired_accounts_are_pruned():
+    limiter = FailedLoginLimiter(max_failures=2, window_seconds=0, max_accounts=100)
+    for i in range(10):
+        limiter.record_failure(f"user{i}@example.com")
+    assert len(limiter._failures) == 0
+
+
+def test_lockout_still_applies_to_a_tracked_account():
+    limiter = FailedLoginLimiter(max_failures=2, window_seconds=900, max_accounts=100)
+    limiter.record_failure("Someone@example.com")
+    limiter.record_failure("someone@example.com ")
+    with pytest.raises(HTTPException) as excinfo:
+        limiter.check("SOMEONE@example.com")
+    assert excinfo.value.status_code == 429
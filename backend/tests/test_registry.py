@@ -0,0 +1,92 @@
+import asyncio
+import pickle
+import time
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.inference import registry as registry_module
+from app.inference.executors import run_inference
+from app.inference.registry import ModelRegistry
+
+LOAD_SECONDS = 0.3
+
+
+class FakeBackend:
+    name = "fake"
+    precision = "float32"
+
+    def __init__(self, models_dir):
+        self.model_path = models_dir / "model.bin"
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        return np.zeros((len(img_batch), 2), dtype=np.float32)
+
+
+def slow_load_backend(models_dir):
+    time.sleep(LOAD_SECONDS)
+    return FakeBackend(models_dir)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry_dir = tmp_path / "registry"
+    for version in ("v1", "v2"):
+        version_dir = registry_dir / version
+        version_dir.mkdir(parents=True)
+        (version_dir / "model.bin").write_bytes(version.encode())
+        for name, mapping in (("class_indices.pkl", {"fresh": 0, "rotten": 1}), ("label_mapping.pkl", {0: "fresh", 1: "rotten"})):
+            with open(version_dir / name, "wb") as f:
+                pickle.dump(mapping, f)
+    monkeypatch.setattr(registry_module, "load_backend", slow_load_backend)
+    return ModelRegistry(registry_dir, tmp_path / "legacy")
+
+
+def test_swap_waits_for_requests_holding_the_old_model(registry):
+    async def scenario():
+        await registry.activate("v1")
+        async with registry.use() as held:
+            await registry.activate("v2")
+            assert registry.active.version == "v2"
+            await asyncio.sleep(0.05)
+            # Still pinned by this request, so not released yet
+            assert held.backend is not None
+            assert held.predict(np.zeros((1, 1))).shape == (1, 2)
+        await asyncio.wait_for(asyncio.gather(*registry._retiring), 1)
+        assert held.backend is None
+        assert held.in_flight == 0
+        assert (registry.registry_dir / "ACTIVE").read_text() == "v2"
+
+    asyncio.run(scenario())
+
+
+def test_drain_timeout_releases_model_and_late_predictions_get_503(registry, monkeypatch):
+    monkeypatch.setattr(registry_module, "MODEL_DRAIN_TIMEOUT", 0.05)
+
+    async def scenario():
+        await registry.activate("v1")
+        async with registry.use() as held:
+            await registry.activate("v2")
+            await asyncio.wait_for(asyncio.gather(*registry._retiring), 1)
+            assert held.backend is None
+            with pytest.raises(HTTPException) as excinfo:
+                held.predict(np.zeros((1, 1)))
+            assert excinfo.value.status_code == 503
+
+    asyncio.run(scenario())
+
+
+def test_loading_a_version_does_not_block_inference(registry):
+    async def scenario():
+        await registry.activate("v1")
+        swap = asyncio.create_task(registry.activate("v2"))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await run_inference(lambda: None)
+        waited = time.perf_counter() - start
+        await swap
+        assert waited < LOAD_SECONDS / 2
+        assert registry.active.version == "v2"
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.inference.uploads import RequestBodyLimit, upload_stats
+
+LIMIT = 64 * 1024
+BOUNDARY = "gradefresh-test"
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(RequestBodyLimit, limits={"/upload": lambda: LIMIT})
+    app.state.handled = 0
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.handled += 1
+        return {"size": len(await file.read())}
+
+    @app.post("/unlimited")
+    async def unlimited(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return app, TestClient(app)
+
+
+def chunked_body(size: int):
+    """A multipart body sent without Content-Length, in 16KB chunks"""
+    yield (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n"
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    for _ in range(size // (16 * 1024)):
+        yield b"x" * (16 * 1024)
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def test_body_within_limit_reaches_the_handler():
+    app, client = make_client()
+    response = client.post("/upload", files={"file": ("a.jpg", b"x" * 1024, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1024}
+    assert app.state.handled == 1
+
+
+def test_declared_content_length_over_limit_is_refused_before_parsing():
+    app, client = make_client()
+    rejected = upload_stats.rejected_too_large
+    response = client.post("/upload", files={"file": ("a.jpg", b"x" * (2 * LIMIT), "image/jpeg")})
+    assert response.status_code == 413
+    assert "limit" in response.json()["detail"]
+    assert app.state.handled == 0
+    assert upload_stats.rejected_too_large == rejected + 1
+
+
+def test_chunked_body_is_cut_off_once_it_passes_the_limit():
+    app, client = make_client()
+    response = client.post(
+        "/upload",
+        content=chunked_body(4 * LIMIT),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    assert response.status_code == 413
+    assert app.state.handled == 0
+
+
+def test_routes_without_a_limit_pass_through():
+    _, client = make_client()
+    response = client.post("/unlimited", files={"file": ("a.jpg", b"x" * (2 * LIMIT), "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 2 * LIMIT}